@@ -10,8 +10,95 @@ class Config:
     REDIRECT_URI = os.getenv("ZOHO_REDIRECT_URI")
     ZOHO_ACCOUNTS_URL = "https://accounts.zoho.com"
     ZOHO_API_URL = "https://www.zohoapis.com"
+    ZOHO_JWKS_URL = os.getenv("ZOHO_JWKS_URL", f"{ZOHO_ACCOUNTS_URL}/oauth/v2/keys")
+    ZOHO_ID_TOKEN_ISSUER = os.getenv("ZOHO_ID_TOKEN_ISSUER", ZOHO_ACCOUNTS_URL)
+    JWKS_CACHE_TTL = float(os.getenv("JWKS_CACHE_TTL", "3600"))
+    JWKS_MIN_REFETCH_INTERVAL = float(os.getenv("JWKS_MIN_REFETCH_INTERVAL", "60"))
+    ZOHO_CRAWL_CONCURRENCY = int(os.getenv("ZOHO_CRAWL_CONCURRENCY", "8"))
+    ZOHO_POOL_SIZE = int(os.getenv("ZOHO_POOL_SIZE", "32"))
+    ZOHO_HTTP_RETRIES = int(os.getenv("ZOHO_HTTP_RETRIES", "2"))
+    ZOHO_HTTP2 = os.getenv("ZOHO_HTTP2", "false").lower() == "true"
+    ZOHO_PAGE_LIMIT = int(os.getenv("ZOHO_PAGE_LIMIT", "50"))
+    ZOHO_HTTP_TIMEOUT = float(os.getenv("ZOHO_HTTP_TIMEOUT", "30"))
+    ZOHO_USER_RATE = float(os.getenv("ZOHO_USER_RATE", "10"))
+    ZOHO_USER_BURST = float(os.getenv("ZOHO_USER_BURST", "20"))
+    ZOHO_ORG_RATE = float(os.getenv("ZOHO_ORG_RATE", "30"))
+    ZOHO_ORG_BURST = float(os.getenv("ZOHO_ORG_BURST", "60"))
+    ZOHO_MAX_CONCURRENCY = int(os.getenv("ZOHO_MAX_CONCURRENCY", "16"))
+    ZOHO_MIN_CONCURRENCY = int(os.getenv("ZOHO_MIN_CONCURRENCY", "1"))
+    ZOHO_MAX_RETRIES = int(os.getenv("ZOHO_MAX_RETRIES", "4"))
+    ZOHO_BACKOFF_BASE = float(os.getenv("ZOHO_BACKOFF_BASE", "0.5"))
+    ZOHO_BACKOFF_MAX = float(os.getenv("ZOHO_BACKOFF_MAX", "30"))
+    ZOHO_TOKEN_REFRESH_MARGIN = float(os.getenv("ZOHO_TOKEN_REFRESH_MARGIN", "300"))
+    ZOHO_TOKEN_PREFETCH_LEAD = float(os.getenv("ZOHO_TOKEN_PREFETCH_LEAD", "600"))
+    TOKEN_REFRESHER_ENABLED = os.getenv("TOKEN_REFRESHER_ENABLED", "true").lower() == "true"
+    TOKEN_REFRESHER_INTERVAL = float(os.getenv("TOKEN_REFRESHER_INTERVAL", "60"))
+    TOKEN_REFRESHER_ACTIVE_WITHIN = float(os.getenv("TOKEN_REFRESHER_ACTIVE_WITHIN", "86400"))
+    TOKEN_REFRESHER_BATCH_SIZE = int(os.getenv("TOKEN_REFRESHER_BATCH_SIZE", "50"))
+    TOKEN_REFRESHER_CONCURRENCY = int(os.getenv("TOKEN_REFRESHER_CONCURRENCY", "5"))
+    TOKEN_REFRESHER_LEASE = float(os.getenv("TOKEN_REFRESHER_LEASE", "60"))
+    USER_ACTIVITY_WRITE_INTERVAL = float(os.getenv("USER_ACTIVITY_WRITE_INTERVAL", "300"))
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+    USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+    USER_CACHE_SYNC_INTERVAL = float(os.getenv("USER_CACHE_SYNC_INTERVAL", "2"))
+    USER_CACHE_SYNC_OVERLAP = float(os.getenv("USER_CACHE_SYNC_OVERLAP", "5"))
+    USER_INVALIDATION_RETENTION = int(os.getenv("USER_INVALIDATION_RETENTION", "3600"))
+    CHAT_HISTORY_LIMIT = int(os.getenv("CHAT_HISTORY_LIMIT", "20"))
+    CONVERSATION_CACHE_SIZE = int(os.getenv("CONVERSATION_CACHE_SIZE", "10000"))
+    CONVERSATION_CACHE_TTL = float(os.getenv("CONVERSATION_CACHE_TTL", "1800"))
+    CONVERSATION_CACHE_MAX_BYTES = int(os.getenv("CONVERSATION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    CHAT_SUMMARY_KEEP_TURNS = int(os.getenv("CHAT_SUMMARY_KEEP_TURNS", "6"))
+    CHAT_SUMMARY_FOLD_EVERY = int(os.getenv("CHAT_SUMMARY_FOLD_EVERY", "4"))
+    CHAT_SUMMARY_MAX_FOLD = int(os.getenv("CHAT_SUMMARY_MAX_FOLD", "40"))
+    CHAT_SUMMARY_MAX_WORDS = int(os.getenv("CHAT_SUMMARY_MAX_WORDS", "200"))
+    CHAT_LOG_QUEUE_SIZE = int(os.getenv("CHAT_LOG_QUEUE_SIZE", "10000"))
+    CHAT_LOG_BATCH_SIZE = int(os.getenv("CHAT_LOG_BATCH_SIZE", "100"))
+    CHAT_LOG_FLUSH_INTERVAL = float(os.getenv("CHAT_LOG_FLUSH_INTERVAL", "1"))
+    CHAT_LOG_MAX_RETRIES = int(os.getenv("CHAT_LOG_MAX_RETRIES", "3"))
+    CHAT_LOG_SHUTDOWN_TIMEOUT = float(os.getenv("CHAT_LOG_SHUTDOWN_TIMEOUT", "10"))
+    SESSION_BACKEND = os.getenv("SESSION_BACKEND", "mongo")  # "mongo" or "memory"
+    SESSION_COOKIE_NAME = os.getenv("SESSION_COOKIE_NAME", "session_id")
+    SESSION_COOKIE_SECURE = os.getenv("SESSION_COOKIE_SECURE", "false").lower() == "true"
+    SESSION_TTL = int(os.getenv("SESSION_TTL", "604800"))
+    SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+    SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "60"))
+    ZOHO_CALENDAR_URL = "https://calendar.zoho.com"
+    CALENDAR_CACHE_SIZE = int(os.getenv("CALENDAR_CACHE_SIZE", "1024"))
+    CALENDAR_CACHE_TTL = float(os.getenv("CALENDAR_CACHE_TTL", "3600"))
+    WORKDRIVE_INGEST_CONCURRENCY = int(os.getenv("WORKDRIVE_INGEST_CONCURRENCY", "4"))
+    WORKDRIVE_INGEST_BATCH_SIZE = int(os.getenv("WORKDRIVE_INGEST_BATCH_SIZE", "64"))
+    WORKDRIVE_INDEX_DIR = os.getenv("WORKDRIVE_INDEX_DIR", "data/workdrive_index")
+    WORKDRIVE_INDEX_MAX_AGE = float(os.getenv("WORKDRIVE_INDEX_MAX_AGE", "300"))
+    WORKDRIVE_CURSOR_TTL = float(os.getenv("WORKDRIVE_CURSOR_TTL", "3600"))
     ASTRA_DB_API_KEY = os.getenv("ASTRA_DB_API_KEY")
     ASTRA_DB_ENDPOINT = "https://3a001a12-2fc2-4aa1-ba00-4b8fff800e7d-us-east-2.apps.astra.datastax.com"
     ASTRA_COLLECTION = "sop_rag"
+    VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "astra")  # "astra" or "local"
+    LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", "data/vectors")
+    LOCAL_VECTOR_IVF_MIN_ROWS = int(os.getenv("LOCAL_VECTOR_IVF_MIN_ROWS", "50000"))
+    LOCAL_VECTOR_IVF_LISTS = int(os.getenv("LOCAL_VECTOR_IVF_LISTS", "0"))  # 0 = 4 * sqrt(rows)
+    LOCAL_VECTOR_IVF_NPROBE = int(os.getenv("LOCAL_VECTOR_IVF_NPROBE", "16"))
+    LOCAL_VECTOR_IVF_SAMPLE_PER_LIST = int(os.getenv("LOCAL_VECTOR_IVF_SAMPLE_PER_LIST", "64"))
+    LOCAL_VECTOR_IVF_REBUILD_RATIO = float(os.getenv("LOCAL_VECTOR_IVF_REBUILD_RATIO", "0.2"))
+    LOCAL_VECTOR_QUANTIZATION = os.getenv("LOCAL_VECTOR_QUANTIZATION", "none")  # "none", "float16", "int8" or "pq"
+    LOCAL_VECTOR_RERANK = os.getenv("LOCAL_VECTOR_RERANK", "true").lower() == "true"
+    LOCAL_VECTOR_RERANK_FACTOR = int(os.getenv("LOCAL_VECTOR_RERANK_FACTOR", "10"))
+    LOCAL_VECTOR_PQ_SUBSPACES = int(os.getenv("LOCAL_VECTOR_PQ_SUBSPACES", "96"))
+    LOCAL_VECTOR_PQ_MIN_ROWS = int(os.getenv("LOCAL_VECTOR_PQ_MIN_ROWS", "10000"))
+    LOCAL_VECTOR_PQ_TRAIN_SAMPLE = int(os.getenv("LOCAL_VECTOR_PQ_TRAIN_SAMPLE", "65536"))
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-mpnet-base-v2")
+    EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "cpu")
+    EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "20000"))
+    EMBEDDING_DISK_CACHE_ENABLED = os.getenv("EMBEDDING_DISK_CACHE_ENABLED", "true").lower() == "true"
+    EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "data/embedding_cache")
+    EMBEDDING_WARMUP_MODELS = [
+        name.strip() for name in os.getenv("EMBEDDING_WARMUP_MODELS", EMBEDDING_MODEL).split(",") if name.strip()
+    ]
     GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
     LLM_MODEL = "models/gemini-2.0-flash"
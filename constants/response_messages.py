@@ -16,3 +16,5 @@ NO_TEAMS_FOUND = "No teams found."
 NO_ROOT_FOLDER = "Could not get My Folders root ID."
 NO_CODE = "No code received from Zoho."
 NO_ACCESS_TOKEN = "No access_token received."
+INVALID_CURSOR = "Invalid or expired continuation cursor."
+INVALID_ID_TOKEN = "Could not verify the id_token from Zoho."
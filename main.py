@@ -1,11 +1,52 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from routers.zoho import auth, folders
 from routers.chatbot.app.query import routes
 
 from routers.zoho import auth, folders,org_info
+from utils.zoho_client import zoho_client
+from utils.token_refresher import token_refresher
+from utils.session_store import session_store
+from utils.shared import mongo, user_cache, ensure_user_indexes
+from utils.jwks_cache import jwks_cache
+from routers.chatbot.app.db.chat_log_writer import chat_log_writer
+from routers.chatbot.app.db.chat_history import ensure_chat_indexes
+from routers.chatbot.app.db.embeddings import embedding_registry
+from routers.chatbot.app.db.vectorstore import get_vectorstore
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    mongo.connect()
+    for ensure_indexes in (ensure_user_indexes, ensure_chat_indexes, session_store.backend.ensure_indexes):
+        try:
+            await ensure_indexes()
+        except Exception as e:
+            print(f"⚠️ Could not create indexes ({ensure_indexes.__name__}): {e}")
+    try:
+        await asyncio.to_thread(embedding_registry.warmup)
+    except Exception as e:
+        print(f"⚠️ Embedding warmup failed, models will load on first use: {e}")
+    try:
+        await asyncio.to_thread(get_vectorstore)
+    except Exception as e:
+        print(f"⚠️ Vectorstore setup failed, it will be retried on first use: {e}")
+    user_cache.start()
+    token_refresher.start()
+    jwks_cache.start()
+    chat_log_writer.start()
+    yield
+    await chat_log_writer.stop()
+    await jwks_cache.stop()
+    await token_refresher.stop()
+    await user_cache.stop()
+    await zoho_client.aclose()
+    await mongo.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Add this block to enable CORS
 origins = [
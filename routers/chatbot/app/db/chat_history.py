@@ -1,38 +1,129 @@
 # db/chat_history.py
 
+from collections import deque
 from datetime import datetime
 from langchain_core.messages import HumanMessage, AIMessage
-from utils.shared import chatlogs_collection  # 👈 from your updated mongo.py
+from config import Config
+from utils.lru_cache import LRUCache
+from utils.shared import mongo, user_cache
+from .chat_log_writer import chat_log_writer
 
+# Rough per-message cost of the LangChain objects on top of their text
+_MESSAGE_OVERHEAD = 512
 
-def save_chat_log(user_id: str, user_input: str, bot_response: str, response_type="rag", tool_used=None):
+
+def _conversation_bytes(turns: deque) -> int:
+    return sum(len(message.content) + _MESSAGE_OVERHEAD for turn in turns for message in turn[1:])
+
+
+# user_id -> ring buffer of the latest CHAT_HISTORY_LIMIT (timestamp, HumanMessage, AIMessage) turns.
+# Turns saved on other workers drop the entry through the user cache feed once they are
+# flushed ("conversation" events); CONVERSATION_CACHE_TTL bounds staleness if the feed is down.
+conversation_cache = LRUCache(
+    maxsize=Config.CONVERSATION_CACHE_SIZE,
+    ttl=Config.CONVERSATION_CACHE_TTL,
+    max_weight=Config.CONVERSATION_CACHE_MAX_BYTES,
+    weigher=_conversation_bytes
+)
+user_cache.add_listener(conversation_cache.pop, kind="conversation")
+
+
+def _turn(timestamp: datetime, user_input: str, bot_response: str) -> tuple:
+    return timestamp, HumanMessage(content=user_input), AIMessage(content=bot_response)
+
+
+def turn_messages(turns) -> list:
+    """
+    Flattens (timestamp, HumanMessage, AIMessage) turns into a message list.
+    """
+    return [message for turn in turns for message in turn[1:]]
+
+
+async def save_chat_log(user_id: str, user_input: str, bot_response: str, response_type="rag", tool_used=None):
     """
-    Save a single chat turn to MongoDB.
+    Save a single chat turn to MongoDB (write-behind, see ChatLogWriter)
+    and to the user's cached conversation, if there is one.
     """
-    chatlogs_collection.insert_one({
+    now = datetime.now()
+    timestamp = now.replace(microsecond=now.microsecond // 1000 * 1000)  # BSON dates keep milliseconds
+    turns = conversation_cache.get(user_id)
+    if turns is not None:
+        turns.append(_turn(timestamp, user_input, bot_response))
+        conversation_cache.set(user_id, turns)  # re-weigh
+
+    await chat_log_writer.write({
         "user_id": user_id,
         "user_input": user_input,
         "bot_response": bot_response,
         "type": response_type,
         "tool_used": tool_used,
-        "timestamp": datetime.now()
+        "timestamp": timestamp
     })
 
 
-def get_chat_history(user_id: str, limit: int = 20) -> list:
+async def ensure_chat_indexes():
     """
-    Fetch recent chat history for a user, sorted by timestamp ASC.
-    Returns as a list of LangChain-compatible messages.
+    (user_id, timestamp DESC) serves "latest N turns" as a bounded index scan;
+    chat_summaries holds one rolling summary per user.
     """
-    history = []
+    await mongo.chat_logs.create_index([("user_id", 1), ("timestamp", -1)])
+    await mongo.chat_summaries.create_index("user_id", unique=True)
+
 
-    cursor = chatlogs_collection.find(
-        {"user_id": user_id},
-        sort=[("timestamp", 1)]
-    ).limit(limit)
+async def load_chat_turns(
+    user_id: str, limit: int, after: datetime = None, before: datetime = None, oldest: bool = False
+) -> list:
+    """
+    The user's latest `limit` turns (the earliest with `oldest=True`) newer than `after` and
+    older than `before`, if given, from MongoDB, oldest first, including turns this worker
+    has not flushed yet.
+    """
+    query = {"user_id": user_id}
+    if after is not None or before is not None:
+        query["timestamp"] = {}
+        if after is not None:
+            query["timestamp"]["$gt"] = after
+        if before is not None:
+            query["timestamp"]["$lt"] = before
+    cursor = mongo.chat_logs.find(
+        query,
+        {"_id": 0, "timestamp": 1, "user_input": 1, "bot_response": 1},
+        sort=[("timestamp", 1 if oldest else -1)],
+        limit=limit
+    )
+    docs = [doc async for doc in cursor]
+    stored = {doc["timestamp"] for doc in docs}
+    docs.extend(
+        record for record in chat_log_writer.pending(user_id)
+        if record["timestamp"] not in stored
+        and (after is None or record["timestamp"] > after)
+        and (before is None or record["timestamp"] < before)
+    )
+    docs.sort(key=lambda doc: doc["timestamp"])
+    if limit:
+        docs = docs[:limit] if oldest else docs[-limit:]
+    return [_turn(doc["timestamp"], doc["user_input"], doc["bot_response"]) for doc in docs]
 
-    for doc in cursor:
-        history.append(HumanMessage(content=doc["user_input"]))
-        history.append(AIMessage(content=doc["bot_response"]))
 
-    return history
+async def get_chat_turns(user_id: str, limit: int = Config.CHAT_HISTORY_LIMIT) -> list:
+    """
+    The user's latest `limit` (timestamp, HumanMessage, AIMessage) turns, oldest first,
+    from the conversation cache (loaded from MongoDB on a miss).
+    """
+    if limit > Config.CHAT_HISTORY_LIMIT:
+        turns = await load_chat_turns(user_id, limit)
+    else:
+        turns = conversation_cache.get(user_id)
+        if turns is None:
+            turns = deque(await load_chat_turns(user_id, Config.CHAT_HISTORY_LIMIT), maxlen=Config.CHAT_HISTORY_LIMIT)
+            conversation_cache.set(user_id, turns)
+        turns = list(turns)[-limit:] if limit else []
+    return turns
+
+
+async def get_chat_history(user_id: str, limit: int = Config.CHAT_HISTORY_LIMIT) -> list:
+    """
+    Fetch the user's latest `limit` chat turns, oldest first.
+    Returns as a list of LangChain-compatible messages.
+    """
+    return turn_messages(await get_chat_turns(user_id, limit))
@@ -0,0 +1,117 @@
+# db/chat_log_writer.py
+
+import asyncio
+import time
+from config import Config
+from utils.shared import mongo, user_cache
+
+
+class ChatLogWriter:
+    """
+    Write-behind persistence for chat logs.
+
+    `write` only enqueues the record; a background task drains the queue and stores
+    records with one `insert_many` per CHAT_LOG_BATCH_SIZE records or every
+    CHAT_LOG_FLUSH_INTERVAL seconds, whichever comes first. The queue is bounded
+    (CHAT_LOG_QUEUE_SIZE), so when Mongo falls behind `write` waits instead of
+    buffering without limit. `stop` flushes whatever is still queued.
+
+    Records not stored yet are kept per user (`pending`) so reads can merge them in.
+    After each flush the affected users are published on the user cache feed as
+    "conversation" events, so other workers drop their cached conversations.
+    """
+
+    def __init__(self):
+        self._queue = None
+        self._task = None
+        self._pending = {}
+
+    async def _insert(self, batch: list):
+        try:
+            for attempt in range(1, Config.CHAT_LOG_MAX_RETRIES + 1):
+                try:
+                    await mongo.chat_logs.insert_many(batch, ordered=False)
+                    break
+                except Exception as e:
+                    print(f"⚠️ Chat log flush failed ({attempt}/{Config.CHAT_LOG_MAX_RETRIES}): {e}")
+                    if attempt < Config.CHAT_LOG_MAX_RETRIES:
+                        await asyncio.sleep(Config.ZOHO_BACKOFF_BASE * 2 ** (attempt - 1))
+            else:
+                print(f"❌ Dropped {len(batch)} chat log(s) after {Config.CHAT_LOG_MAX_RETRIES} attempts")
+                return
+            await user_cache.publish(list({record["user_id"] for record in batch}), kind="conversation")
+        finally:
+            for record in batch:
+                pending = self._pending.get(record["user_id"])
+                if pending is not None:
+                    pending.remove(record)
+                    if not pending:
+                        del self._pending[record["user_id"]]
+
+    def pending(self, user_id: str) -> list:
+        """
+        The user's records that are queued or being flushed, oldest first.
+        """
+        return list(self._pending.get(user_id, ()))
+
+    async def run(self):
+        closing = False
+        while not closing:
+            record = await self._queue.get()
+            if record is None:
+                break
+
+            batch = [record]
+            deadline = time.monotonic() + Config.CHAT_LOG_FLUSH_INTERVAL
+            while len(batch) < Config.CHAT_LOG_BATCH_SIZE:
+                try:
+                    record = await asyncio.wait_for(self._queue.get(), max(deadline - time.monotonic(), 0))
+                except asyncio.TimeoutError:
+                    break
+                if record is None:
+                    closing = True
+                    break
+                batch.append(record)
+
+            await self._insert(batch)
+
+    async def write(self, record: dict):
+        """
+        Queues a chat log; written directly when the writer is not running (scripts, tests).
+        """
+        if self._task is None:
+            await mongo.chat_logs.insert_one(record)
+            await user_cache.publish([record["user_id"]], kind="conversation")
+            return
+        self._pending.setdefault(record["user_id"], []).append(record)
+        await self._queue.put(record)
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=Config.CHAT_LOG_QUEUE_SIZE)
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """
+        Flushes everything queued so far, then stops the background task.
+        """
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        await self._queue.put(None)
+        done, _ = await asyncio.wait({task}, timeout=Config.CHAT_LOG_SHUTDOWN_TIMEOUT)
+        if not done:
+            # Counted before cancelling: _insert's cleanup empties _pending as the task unwinds
+            dropped = sum(len(records) for records in self._pending.values())
+            task.cancel()
+            print(f"⚠️ Chat log writer did not flush within {Config.CHAT_LOG_SHUTDOWN_TIMEOUT}s; "
+                  f"cancelled it, {dropped} turn(s) dropped")
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"❌ Chat log writer failed: {e}")
+
+
+chat_log_writer = ChatLogWriter()
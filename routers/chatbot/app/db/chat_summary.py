@@ -0,0 +1,54 @@
+# db/chat_summary.py
+
+from datetime import datetime
+from pymongo.errors import DuplicateKeyError
+from config import Config
+from utils.lru_cache import LRUCache
+from utils.shared import mongo, user_cache
+
+_EMPTY = {"summary": "", "until": None}
+
+# user_id -> {"summary", "until"}; `until` is the timestamp of the newest turn folded in.
+# Dropped through the user cache feed ("summary" events) when another worker folds.
+summary_cache = LRUCache(maxsize=Config.CONVERSATION_CACHE_SIZE, ttl=Config.CONVERSATION_CACHE_TTL)
+user_cache.add_listener(summary_cache.pop, kind="summary")
+
+
+async def load_chat_summary(user_id: str) -> dict:
+    """
+    The user's stored rolling summary, read from MongoDB (bypassing the cache).
+    """
+    doc = await mongo.chat_summaries.find_one({"user_id": user_id}, {"_id": 0, "summary": 1, "until": 1})
+    return {"summary": doc["summary"], "until": doc["until"]} if doc else dict(_EMPTY)
+
+
+async def get_chat_summary(user_id: str) -> dict:
+    """
+    The user's rolling conversation summary (empty if nothing was folded yet).
+    """
+    entry = summary_cache.get(user_id)
+    if entry is None:
+        entry = await load_chat_summary(user_id)
+        summary_cache.set(user_id, entry)
+    return entry
+
+
+async def save_chat_summary(user_id: str, summary: str, until: datetime) -> bool:
+    """
+    Stores the summary unless the stored one already covers `until` (another worker folded
+    further in the meantime). Returns whether it was stored.
+    """
+    entry = {"summary": summary, "until": until}
+    try:
+        await mongo.chat_summaries.update_one(
+            {"user_id": user_id, "$or": [{"until": None}, {"until": {"$lt": until}}]},
+            {"$set": {**entry, "updated_at": datetime.now()}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # The filter missed the existing (newer) summary, so the upsert hit the unique user_id index
+        summary_cache.pop(user_id)
+        return False
+    summary_cache.set(user_id, entry)
+    await user_cache.publish([user_id], kind="summary")
+    return True
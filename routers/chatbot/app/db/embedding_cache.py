@@ -0,0 +1,210 @@
+# db/embedding_cache.py
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from config import Config
+from utils.lru_cache import LRUCache
+
+SCHEMA = """
+PRAGMA journal_mode = WAL;
+
+CREATE TABLE IF NOT EXISTS embeddings (
+    hash TEXT PRIMARY KEY,
+    row INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# SQLite's default limit on host parameters per statement is 999
+_LOOKUP_CHUNK = 500
+
+# (model_name, text hash) -> float32 vector, shared by every model in the process
+memory_cache = LRUCache(maxsize=Config.EMBEDDING_CACHE_SIZE)
+
+
+class EmbeddingDiskCache:
+    """
+    Persistent embedding store for one model: vectors live in a float32 file read through
+    a NumPy memmap, and a SQLite table maps text hash -> row.
+
+    Writers allocate rows inside a `BEGIN IMMEDIATE` transaction and flush the vectors
+    before committing the index, so several workers can share the directory and readers
+    never see a row whose vector is not written yet.
+    """
+
+    def __init__(self, model_name: str, directory: str = None):
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        self.directory = directory or os.path.join(Config.EMBEDDING_CACHE_DIR, safe_name)
+        os.makedirs(self.directory, exist_ok=True)
+        self.index_path = os.path.join(self.directory, "index.sqlite3")
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self._vectors = None
+        self._lock = threading.Lock()
+        with self.connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def connect(self):
+        conn = sqlite3.connect(self.index_path, timeout=30, isolation_level=None, check_same_thread=False)
+        try:
+            conn.execute("PRAGMA synchronous = NORMAL")
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _meta(conn, key: str):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return int(row[0]) if row else None
+
+    def _mapped(self, rows: int, dim: int) -> np.memmap:
+        """
+        Memmap covering at least `rows` rows; remapped when another writer has grown the file.
+        """
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[0] < rows or self._vectors.shape[1] != dim:
+                capacity = os.path.getsize(self.vectors_path) // (dim * 4)
+                self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, dim))
+            return self._vectors
+
+    def get_many(self, hashes: list) -> dict:
+        hashes = list(hashes)
+        with self.connect() as conn:
+            dim = self._meta(conn, "dim")
+            if dim is None:
+                return {}
+            rows = {}
+            for start in range(0, len(hashes), _LOOKUP_CHUNK):
+                chunk = hashes[start:start + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows.update(conn.execute(
+                    f"SELECT hash, row FROM embeddings WHERE hash IN ({placeholders})", chunk
+                ).fetchall())
+        if not rows:
+            return {}
+        vectors = self._mapped(max(rows.values()) + 1, dim)
+        return {key: np.array(vectors[row]) for key, row in rows.items()}
+
+    def put_many(self, items: dict):
+        if not items:
+            return
+        dim = len(next(iter(items.values())))
+        with self.connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                stored_dim = self._meta(conn, "dim")
+                if stored_dim is not None and stored_dim != dim:
+                    raise ValueError(f"Embedding dimension changed ({stored_dim} -> {dim}) in {self.directory}")
+
+                existing = set()
+                keys = list(items)
+                for start in range(0, len(keys), _LOOKUP_CHUNK):
+                    chunk = keys[start:start + _LOOKUP_CHUNK]
+                    placeholders = ",".join("?" * len(chunk))
+                    existing.update(key for (key,) in conn.execute(
+                        f"SELECT hash FROM embeddings WHERE hash IN ({placeholders})", chunk
+                    ))
+                new_keys = [key for key in keys if key not in existing]
+                if not new_keys:
+                    conn.execute("COMMIT")
+                    return
+
+                first_row = self._meta(conn, "next_row") or 0
+                end_row = first_row + len(new_keys)
+                capacity = os.path.getsize(self.vectors_path) // (dim * 4) if os.path.exists(self.vectors_path) else 0
+                if end_row > capacity:
+                    with open(self.vectors_path, "ab") as f:
+                        f.truncate(max(end_row, capacity * 2, 1024) * dim * 4)
+
+                vectors = self._mapped(end_row, dim)
+                vectors[first_row:end_row] = np.asarray([items[key] for key in new_keys], dtype=np.float32)
+                vectors.flush()
+
+                conn.executemany(
+                    "INSERT INTO embeddings (hash, row) VALUES (?, ?)",
+                    [(key, first_row + offset) for offset, key in enumerate(new_keys)]
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                    [("dim", str(dim)), ("next_row", str(end_row))]
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that only runs the model for texts it has never seen.
+
+    Lookups go to the in-process LRU (EMBEDDING_CACHE_SIZE vectors) first, then to the
+    model's EmbeddingDiskCache; only the remaining misses are embedded, once per distinct
+    text, and written back to both tiers. Query and document embeddings are cached
+    separately, since a model may encode them differently.
+    """
+
+    def __init__(self, model_name: str, embeddings: Embeddings, disk: EmbeddingDiskCache = None):
+        self.model_name = model_name
+        self.embeddings = embeddings
+        self.disk = disk
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "computed": 0}
+
+    @staticmethod
+    def _hash(kind: str, text: str) -> str:
+        return hashlib.sha256(f"{kind}\0{text}".encode()).hexdigest()
+
+    def _embed(self, kind: str, texts: list, compute) -> list:
+        hashes = [self._hash(kind, text) for text in texts]
+        found = {}
+        for key in hashes:
+            vector = memory_cache.get((self.model_name, key))
+            if vector is not None:
+                found[key] = vector
+        self.stats["memory_hits"] += len(found)
+
+        missing = {key: text for key, text in zip(hashes, texts) if key not in found}
+        if missing and self.disk is not None:
+            try:
+                from_disk = self.disk.get_many(missing)
+            except Exception as e:
+                print(f"⚠️ Embedding disk cache read failed: {e}")
+                from_disk = {}
+            for key, vector in from_disk.items():
+                memory_cache.set((self.model_name, key), vector)
+                del missing[key]
+            found.update(from_disk)
+            self.stats["disk_hits"] += len(from_disk)
+
+        if missing:
+            computed = {
+                key: np.asarray(vector, dtype=np.float32)
+                for key, vector in zip(missing, compute(list(missing.values())))
+            }
+            for key, vector in computed.items():
+                memory_cache.set((self.model_name, key), vector)
+            found.update(computed)
+            self.stats["computed"] += len(computed)
+            if self.disk is not None:
+                try:
+                    self.disk.put_many(computed)
+                except Exception as e:
+                    print(f"⚠️ Embedding disk cache write failed: {e}")
+
+        return [found[key].tolist() for key in hashes]
+
+    def embed_documents(self, texts: list) -> list:
+        return self._embed("document", texts, self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> list:
+        return self._embed("query", [text], lambda texts: [self.embeddings.embed_query(texts[0])])[0]
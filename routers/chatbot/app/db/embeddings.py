@@ -0,0 +1,107 @@
+# db/embeddings.py
+
+import os
+import threading
+import time
+from langchain_huggingface import HuggingFaceEmbeddings
+from config import Config
+from .embedding_cache import CachedEmbeddings, EmbeddingDiskCache
+
+try:
+    import psutil
+except ImportError:  # optional, only used for memory reporting
+    psutil = None
+
+
+def _rss_bytes():
+    return psutil.Process(os.getpid()).memory_info().rss if psutil else None
+
+
+def _parameter_bytes(embeddings) -> int:
+    model = getattr(embeddings, "_client", None)
+    if model is None or not hasattr(model, "parameters"):
+        return 0
+    return sum(p.numel() * p.element_size() for p in model.parameters())
+
+
+class EmbeddingRegistry:
+    """
+    Loads each sentence-transformers model once per process and hands out the shared instance.
+
+    `warmup` (called from the FastAPI lifespan) loads the configured models and runs one
+    encode, so the first request does not pay for model loading or lazy initialisation.
+    `stats` reports load/warmup time and memory per model. `cached` wraps a model in
+    the two-tier embedding cache, which is what the vectorstores use.
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._cached = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str = None) -> HuggingFaceEmbeddings:
+        model_name = model_name or Config.EMBEDDING_MODEL
+        embeddings = self._models.get(model_name)
+        if embeddings is not None:
+            return embeddings
+
+        with self._lock:
+            if model_name not in self._models:
+                self._models[model_name] = self._load(model_name)
+            return self._models[model_name]
+
+    def cached(self, model_name: str = None):
+        """
+        The shared model behind CachedEmbeddings (memory LRU + disk tier), unless EMBEDDING_CACHE_ENABLED is off.
+        """
+        model_name = model_name or Config.EMBEDDING_MODEL
+        if not Config.EMBEDDING_CACHE_ENABLED:
+            return self.get(model_name)
+
+        embeddings = self._cached.get(model_name)
+        if embeddings is None:
+            model = self.get(model_name)
+            with self._lock:
+                if model_name not in self._cached:
+                    disk = EmbeddingDiskCache(model_name) if Config.EMBEDDING_DISK_CACHE_ENABLED else None
+                    self._cached[model_name] = CachedEmbeddings(model_name, model, disk)
+                embeddings = self._cached[model_name]
+        return embeddings
+
+    def _load(self, model_name: str) -> HuggingFaceEmbeddings:
+        rss_before = _rss_bytes()
+        started = time.perf_counter()
+        embeddings = HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={"device": Config.EMBEDDING_DEVICE},
+        )
+        rss_after = _rss_bytes()
+
+        self._stats[model_name] = {
+            "load_seconds": round(time.perf_counter() - started, 3),
+            "parameter_bytes": _parameter_bytes(embeddings),
+            "rss_delta_bytes": rss_after - rss_before if rss_before is not None else None,
+        }
+        print(f"🧬 Loaded embedding model {model_name}: {self._stats[model_name]}")
+        return embeddings
+
+    def warmup(self, model_names: list = None):
+        for model_name in model_names or Config.EMBEDDING_WARMUP_MODELS:
+            embeddings = self.get(model_name)
+            started = time.perf_counter()
+            vector = embeddings.embed_query("warmup")
+            self._stats[model_name].update({
+                "warmup_seconds": round(time.perf_counter() - started, 3),
+                "dimension": len(vector),
+            })
+            print(f"🔥 Warmed up {model_name} in {self._stats[model_name]['warmup_seconds']}s")
+
+    def stats(self) -> dict:
+        stats = {model_name: dict(stats) for model_name, stats in self._stats.items()}
+        for model_name, embeddings in self._cached.items():
+            stats.setdefault(model_name, {})["cache"] = dict(embeddings.stats)
+        return stats
+
+
+embedding_registry = EmbeddingRegistry()
@@ -0,0 +1,537 @@
+# db/local_vectorstore.py
+
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from config import Config
+from .quantization import get_quantizer, approximate_top, pq_trainable
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    row INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    text TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+"""
+
+_LOOKUP_CHUNK = 500
+_ASSIGN_BATCH = 4096
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _nearest(vectors, centroids: np.ndarray) -> np.ndarray:
+    """
+    Index of the most similar centroid for every vector, computed in batches to bound memory.
+    """
+    return np.concatenate([
+        np.argmax(np.asarray(vectors[start:start + _ASSIGN_BATCH]) @ centroids.T, axis=1)
+        for start in range(0, len(vectors), _ASSIGN_BATCH)
+    ])
+
+
+_COMPARISONS = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<=", "$ne": "!="}
+
+
+def _filter_sql(filter: dict):
+    """
+    SQL condition over docs.metadata for the metadata filters the app uses with Astra:
+    {"key": value, ...} (all must match), {"key": {"$in": [...]}} or {"key": {"$gte": value}}
+    (also $gt, $lt, $lte, $ne), plus "$or" / "$and" lists of such filters.
+    """
+    clauses, params = [], []
+    for key, value in filter.items():
+        if key in ("$or", "$and"):
+            parts = [_filter_sql(sub) for sub in value]
+            empty = "0" if key == "$or" else "1"
+            clauses.append("(" + (f" {key[1:].upper()} ".join(sql for sql, _ in parts) or empty) + ")")
+            for _, sub_params in parts:
+                params.extend(sub_params)
+        elif isinstance(value, dict):
+            for operator, operand in value.items():
+                if operator == "$in":
+                    clauses.append(f"json_extract(metadata, ?) IN ({','.join('?' * len(operand)) or 'NULL'})")
+                    params.extend([f'$."{key}"', *operand])
+                else:
+                    clauses.append(f"json_extract(metadata, ?) {_COMPARISONS[operator]} ?")
+                    params.extend([f'$."{key}"', operand])
+        else:
+            clauses.append("json_extract(metadata, ?) = ?")
+            params.extend([f'$."{key}"', value])
+    return " AND ".join(clauses) or "1", params
+
+
+def train_ivf(vectors, nlist: int, iterations: int = 10, seed: int = 0):
+    """
+    Spherical k-means over a sample of `vectors`, then every vector is assigned to its list.
+    Returns (centroids, list_offsets, list_rows): the rows of list i are list_rows[offsets[i]:offsets[i + 1]].
+    """
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample_rows = np.sort(rng.choice(n, min(n, nlist * Config.LOCAL_VECTOR_IVF_SAMPLE_PER_LIST), replace=False))
+    sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = _nearest(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        filled = np.bincount(assignment, minlength=nlist) > 0
+        centroids[filled] = _normalize(sums[filled])
+
+    assignment = _nearest(vectors, centroids)
+    list_rows = np.argsort(assignment, kind="stable").astype(np.int64)
+    list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=nlist))]).astype(np.int64)
+    return centroids, list_offsets, list_rows
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector index, a drop-in for AstraDBVectorStore (add_documents, as_retriever, similarity_search).
+
+    Per collection directory (LOCAL_VECTOR_DIR/<collection>):
+      - vectors.f32     unit-length float32 rows, memory-mapped
+      - docs.sqlite3    row -> id, text, metadata
+      - ivf_*.npy       IVF lists (centroids, offsets, rows), memory-mapped, and the rows
+                        overwritten since they were built (ivf_moved.npy)
+      - deleted.npy     rows whose documents were deleted; never returned by a search
+      - codes.bin       quantized copies of the vectors (LOCAL_VECTOR_QUANTIZATION), memory-mapped
+      - state.json      row count, dimension and how many rows the IVF lists / codes cover
+
+    Searches take an optional metadata `filter` (see _filter_sql); only matching rows are scored.
+
+    Search is exact (one matrix-vector product) until the collection reaches
+    LOCAL_VECTOR_IVF_MIN_ROWS; then an IVF index is built and queries only score the
+    LOCAL_VECTOR_IVF_NPROBE closest lists plus the rows added or overwritten since the
+    last build (rebuilt once those exceed LOCAL_VECTOR_IVF_REBUILD_RATIO). Scores are
+    cosine similarity.
+
+    With quantization ("float16", "int8" or "pq") candidates are scored on the compact
+    codes, which is what stays resident; the best k * LOCAL_VECTOR_RERANK_FACTOR are then
+    rescored against the float32 rows (LOCAL_VECTOR_RERANK), touching only those pages.
+
+    Writers hold SQLite's write lock on docs.sqlite3 (`BEGIN IMMEDIATE`) while they
+    allocate rows and rewrite state.json, so several processes can ingest into one
+    collection; readers pick up changes when state.json changes.
+    """
+
+    def __init__(self, embedding: Embeddings, collection_name: str, directory: str = None):
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", collection_name)
+        self.embedding = embedding
+        self.collection_name = collection_name
+        self.directory = directory or os.path.join(Config.LOCAL_VECTOR_DIR, safe_name)
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(self.directory, "docs.sqlite3"), timeout=30, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._state_mtime = None
+        self._load()
+        if self._needs_quantize(self._state):
+            # Searches score the float32 rows until the codes catch up, so the first get() isn't held up
+            threading.Thread(target=self._quantize_in_background, daemon=True).start()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    # ---------- State ----------
+
+    def _read_state(self) -> dict:
+        try:
+            with open(self._path("state.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"count": 0, "dim": None, "ivf_count": 0, "moved_count": 0, "deleted_count": 0,
+                    "quantization": None, "codes_count": 0}
+
+    def _write_state(self, state: dict):
+        tmp_path = self._path("state.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._path("state.json"))
+
+    def _load(self):
+        """
+        (Re)maps the vectors and IVF lists described by state.json.
+        """
+        with self._lock:
+            state = self._read_state()
+            vectors = None
+            if state["count"]:
+                vectors = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r").reshape(-1, state["dim"])
+            ivf = None
+            if state["ivf_count"]:
+                ivf = tuple(
+                    np.load(self._path(f"ivf_{name}.npy"), mmap_mode="r")
+                    for name in ("centroids", "offsets", "rows")
+                )
+            moved = np.empty(0, dtype=np.int64)
+            if ivf is not None and state.get("moved_count"):
+                moved = np.load(self._path("ivf_moved.npy"))
+            deleted = np.empty(0, dtype=np.int64)
+            if state.get("deleted_count"):
+                deleted = np.load(self._path("deleted.npy"))
+            quantizer, codes = None, None
+            if state["dim"]:
+                quantizer = get_quantizer(Config.LOCAL_VECTOR_QUANTIZATION, state["dim"])
+                if quantizer is not None:
+                    quantizer.load(self.directory)
+                    if state.get("quantization") == quantizer.name and state.get("codes_count"):
+                        codes = np.memmap(self._path("codes.bin"), dtype=quantizer.dtype, mode="r").reshape(-1, quantizer.width)
+            self._state, self._vectors, self._ivf, self._moved = state, vectors, ivf, moved
+            self._deleted = deleted
+            self._quantizer, self._codes = quantizer, codes
+            self._state_mtime = self._stat_state()
+
+    def _stat_state(self):
+        try:
+            return os.stat(self._path("state.json")).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _maybe_reload(self):
+        if self._stat_state() != self._state_mtime:
+            self._load()
+
+    def _codes_stale(self, state: dict) -> bool:
+        """
+        Quantization is configured but the codes are missing, of another kind, or behind the vectors.
+        """
+        mode = Config.LOCAL_VECTOR_QUANTIZATION
+        if not mode or mode == "none":
+            return False
+        return state.get("quantization") != mode or state.get("codes_count", 0) < state["count"]
+
+    def _needs_quantize(self, state: dict) -> bool:
+        return bool(state["count"]) and self._codes_stale(state) and (
+            Config.LOCAL_VECTOR_QUANTIZATION != "pq" or pq_trainable(state["count"])
+        )
+
+    def _writable(self, name: str, dtype, width: int, rows: int) -> np.memmap:
+        """
+        Read-write memmap over `name`, grown (doubling) to hold at least `rows` rows.
+        """
+        path = self._path(name)
+        row_bytes = np.dtype(dtype).itemsize * width
+        capacity = os.path.getsize(path) // row_bytes if os.path.exists(path) else 0
+        if rows > capacity:
+            capacity = max(rows, capacity * 2, 1024)
+            with open(path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=(capacity, width))
+
+    def close(self):
+        """
+        Closes the docs connection and drops the memory maps.
+        """
+        with self._lock:
+            self._conn.close()
+            self._vectors = self._ivf = self._codes = None
+
+    # ---------- Writes ----------
+
+    @contextmanager
+    def _write_transaction(self):
+        """
+        `BEGIN IMMEDIATE` on docs.sqlite3: writers in other processes wait here, so each one
+        allocates rows from (and rewrites) the state.json the previous writer left.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+
+    def add_texts(self, texts, metadatas: list = None, ids: list = None, **kwargs) -> list:
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        ids = [doc_id or uuid.uuid4().hex for doc_id in ids] if ids else [uuid.uuid4().hex for _ in texts]
+        vectors = _normalize(np.asarray(self.embedding.embed_documents(texts), dtype=np.float32))
+
+        with self._write_transaction():
+            self._load()  # the state (and moved rows) other writers left
+            state = dict(self._state)
+            dim = vectors.shape[1]
+            if state["dim"] is not None and state["dim"] != dim:
+                raise ValueError(f"Embedding dimension {dim} does not match collection {self.collection_name} ({state['dim']})")
+
+            existing = {}
+            for start in range(0, len(ids), _LOOKUP_CHUNK):
+                chunk = ids[start:start + _LOOKUP_CHUNK]
+                existing.update(
+                    (doc_id, row) for row, doc_id in self._conn.execute(
+                        f"SELECT row, id FROM docs WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                    )
+                )
+            # Overwritten rows keep their number but no longer belong to the IVF list they were built into
+            moved = [row for row in existing.values() if row < state["ivf_count"]]
+            rows = []
+            next_row = state["count"]
+            for doc_id in ids:
+                if doc_id not in existing:
+                    existing[doc_id] = next_row
+                    next_row += 1
+                rows.append(existing[doc_id])
+
+            writable = self._writable("vectors.f32", np.float32, dim, next_row)
+            writable[rows] = vectors
+            writable.flush()
+            del writable
+
+            quantizer = self._quantizer or get_quantizer(Config.LOCAL_VECTOR_QUANTIZATION, dim)
+            if quantizer is not None and quantizer.trained and not self._codes_stale(state):
+                codes = self._writable("codes.bin", quantizer.dtype, quantizer.width, next_row)
+                codes[rows] = quantizer.encode(vectors)
+                codes.flush()
+                del codes
+                state["codes_count"] = next_row
+
+            if moved:
+                moved = np.union1d(self._moved, np.asarray(moved, dtype=np.int64))
+                tmp_path = self._path("ivf_moved.tmp.npy")
+                np.save(tmp_path, moved)
+                os.replace(tmp_path, self._path("ivf_moved.npy"))
+                state["moved_count"] = len(moved)
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO docs (row, id, text, metadata) VALUES (?, ?, ?, ?)",
+                [(row, doc_id, text, json.dumps(metadata, default=str))
+                 for row, doc_id, text, metadata in zip(rows, ids, texts, metadatas)]
+            )
+
+            state.update({"count": next_row, "dim": dim})
+            self._write_state(state)
+            self._load()
+
+        if self._needs_quantize(state):
+            self.quantize()
+
+        unindexed = state["count"] - state["ivf_count"] + state.get("moved_count", 0)
+        if state["count"] >= Config.LOCAL_VECTOR_IVF_MIN_ROWS and (
+            not state["ivf_count"] or unindexed > state["ivf_count"] * Config.LOCAL_VECTOR_IVF_REBUILD_RATIO
+        ):
+            self.build_index()
+        return ids
+
+    def _delete_where(self, where: str, params: list) -> int:
+        with self._write_transaction():
+            self._load()
+            state = dict(self._state)
+            rows = [row for (row,) in self._conn.execute(f"SELECT row FROM docs WHERE {where}", params)]
+            if not rows:
+                return 0
+            self._conn.execute(f"DELETE FROM docs WHERE {where}", params)
+            deleted = np.union1d(self._deleted, np.asarray(rows, dtype=np.int64))
+            tmp_path = self._path("deleted.tmp.npy")
+            np.save(tmp_path, deleted)
+            os.replace(tmp_path, self._path("deleted.npy"))
+            state["deleted_count"] = len(deleted)
+            self._write_state(state)
+            self._load()
+        return len(rows)
+
+    def delete(self, ids: list = None, **kwargs) -> bool:
+        ids = list(ids or [])
+        for start in range(0, len(ids), _LOOKUP_CHUNK):
+            chunk = ids[start:start + _LOOKUP_CHUNK]
+            self._delete_where(f"id IN ({','.join('?' * len(chunk))})", chunk)
+        return True
+
+    def delete_by_metadata_filter(self, filter: dict) -> int:
+        """
+        Deletes the documents matching `filter` (same syntax as search filters). Returns how many.
+        """
+        where, params = _filter_sql(filter)
+        return self._delete_where(where, params)
+
+    def build_index(self):
+        """
+        (Re)builds the IVF lists over every row currently stored.
+        """
+        with self._write_transaction():
+            state = dict(self._read_state())
+            if not state["count"]:
+                return
+            self._load()
+            count = state["count"]
+            nlist = Config.LOCAL_VECTOR_IVF_LISTS or max(1, int(4 * math.sqrt(count)))
+            nlist = min(nlist, count)
+            print(f"🧭 Building IVF index for {self.collection_name}: {count} vectors, {nlist} lists")
+
+            centroids, offsets, rows = train_ivf(self._vectors[:count], nlist)
+            for name, array in (("centroids", centroids), ("offsets", offsets), ("rows", rows)):
+                tmp_path = self._path(f"ivf_{name}.tmp.npy")
+                np.save(tmp_path, array)
+                os.replace(tmp_path, self._path(f"ivf_{name}.npy"))
+
+            state.update({"ivf_count": count, "moved_count": 0})
+            self._write_state(state)
+            self._load()
+
+    def quantize(self):
+        """
+        (Re)encodes every stored vector with the configured quantizer, training it first for PQ.
+        """
+        state = self._read_state()
+        if not state["count"]:
+            return
+        quantizer = get_quantizer(Config.LOCAL_VECTOR_QUANTIZATION, state["dim"])
+        if quantizer is None:
+            return
+        if not quantizer.trained:
+            if not pq_trainable(state["count"]):
+                return
+            # Trained outside the write lock so searches and other writers aren't held up meanwhile
+            self._maybe_reload()
+            vectors, count = self._vectors, min(state["count"], self._state["count"])
+            print(f"🧮 Training {quantizer.name} quantizer for {self.collection_name} on {count} vectors")
+            quantizer.train(vectors[:count])
+
+        with self._write_transaction():
+            state = dict(self._read_state())
+            self._load()
+            count = state["count"]
+            quantizer.save(self.directory)
+
+            codes = self._writable("codes.bin", quantizer.dtype, quantizer.width, count)
+            for start in range(0, count, _ASSIGN_BATCH):
+                end = min(start + _ASSIGN_BATCH, count)
+                codes[start:end] = quantizer.encode(np.asarray(self._vectors[start:end]))
+            codes.flush()
+            del codes
+
+            state.update({"quantization": quantizer.name, "codes_count": count})
+            self._write_state(state)
+            self._load()
+            print(f"🧮 Quantized {count} vectors ({quantizer.name}, {quantizer.bytes_per_vector()} bytes each)")
+
+    def _quantize_in_background(self):
+        try:
+            self.quantize()
+        except Exception as e:
+            print(f"⚠️ Background quantization failed for {self.collection_name}: {e}")
+
+    # ---------- Search ----------
+
+    def _score(self, candidates, query: np.ndarray, state: dict, vectors, quantizer, codes) -> np.ndarray:
+        """
+        Scores for `candidates` rows (None = every row): from the codes where they exist, float32 otherwise.
+        """
+        count = state["count"]
+        if codes is None:
+            return (vectors[:count] if candidates is None else vectors[candidates]) @ query
+
+        codes_count = min(state.get("codes_count", 0), count)
+        if candidates is None:
+            return np.concatenate([quantizer.scores(codes[:codes_count], query), vectors[codes_count:count] @ query])
+        coded = candidates < codes_count
+        scores = np.empty(len(candidates), dtype=np.float32)
+        scores[coded] = quantizer.scores(codes[candidates[coded]], query)
+        scores[~coded] = vectors[candidates[~coded]] @ query
+        return scores
+
+    def _filter_rows(self, filter: dict, count: int) -> np.ndarray:
+        where, params = _filter_sql(filter)
+        with self._lock:
+            rows = [row for (row,) in self._conn.execute(f"SELECT row FROM docs WHERE {where} ORDER BY row", params)]
+        rows = np.asarray(rows, dtype=np.int64)
+        return rows[rows < count]
+
+    def _search(self, vector, k: int, filter: dict = None) -> list:
+        self._maybe_reload()
+        state, vectors, ivf, moved, deleted = self._state, self._vectors, self._ivf, self._moved, self._deleted
+        quantizer, codes = self._quantizer, self._codes
+        count = state["count"]
+        if not count or k <= 0:
+            return []
+
+        query = _normalize(np.asarray(vector, dtype=np.float32))
+        candidates = None
+        if ivf is not None:
+            centroids, offsets, list_rows = ivf
+            nprobe = min(Config.LOCAL_VECTOR_IVF_NPROBE, len(centroids))
+            probe = np.argpartition(-(centroids @ query), nprobe - 1)[:nprobe]
+            listed = np.concatenate([list_rows[offsets[c]:offsets[c + 1]] for c in probe])
+            if len(moved):
+                listed = listed[~np.isin(listed, moved)]
+            # Overwritten and newer rows are always scored; np.unique also sorts
+            candidates = np.unique(np.concatenate(
+                [listed, moved, np.arange(state["ivf_count"], count, dtype=np.int64)]
+            ))
+        if filter:
+            allowed = self._filter_rows(filter, count)
+            candidates = allowed if candidates is None else np.intersect1d(candidates, allowed, assume_unique=True)
+        elif len(deleted):
+            candidates = np.setdiff1d(np.arange(count) if candidates is None else candidates, deleted, assume_unique=True)
+        if candidates is not None and not len(candidates):
+            return []
+
+        scores = self._score(candidates, query, state, vectors, quantizer, codes)
+        rows = candidates if candidates is not None else np.arange(len(scores))
+        if codes is not None and Config.LOCAL_VECTOR_RERANK:
+            shortlist = rows[approximate_top(scores, k * Config.LOCAL_VECTOR_RERANK_FACTOR)]
+            exact = vectors[shortlist] @ query
+            top = approximate_top(exact, k)
+            return list(zip(shortlist[top].tolist(), exact[top].tolist()))
+
+        top = approximate_top(scores, k)
+        return list(zip(rows[top].tolist(), scores[top].tolist()))
+
+    def _documents(self, hits: list) -> list:
+        if not hits:
+            return []
+        rows = [row for row, _ in hits]
+        with self._lock:
+            found = {
+                row: (text, metadata)
+                for row, text, metadata in self._conn.execute(
+                    f"SELECT row, text, metadata FROM docs WHERE row IN ({','.join('?' * len(rows))})", rows
+                )
+            }
+        return [
+            (Document(page_content=found[row][0], metadata=json.loads(found[row][1])), score)
+            for row, score in hits if row in found
+        ]
+
+    def similarity_search_by_vector_with_score(self, embedding: list, k: int = 4, filter: dict = None, **kwargs) -> list:
+        return self._documents(self._search(embedding, k, filter))
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: dict = None, **kwargs) -> list:
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k, filter)
+
+    def similarity_search_by_vector(self, embedding: list, k: int = 4, filter: dict = None, **kwargs) -> list:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search(self, query: str, k: int = 4, filter: dict = None, **kwargs) -> list:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: (score + 1) / 2  # cosine similarity -> [0, 1]
+
+    @classmethod
+    def from_texts(cls, texts, embedding: Embeddings, metadatas: list = None, ids: list = None,
+                   collection_name: str = None, **kwargs):
+        store = cls(embedding, collection_name or Config.ASTRA_COLLECTION, directory=kwargs.get("directory"))
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
@@ -0,0 +1,224 @@
+# db/quantization.py
+
+import os
+import numpy as np
+from config import Config
+
+_BATCH = 4096
+
+
+class Float16Quantizer:
+    """
+    Half-precision copy of each vector: 2 bytes per dimension.
+    """
+
+    name = "float16"
+    trained = True
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.dtype = np.float16
+        self.width = dim
+        self.scale = 1
+
+    def bytes_per_vector(self) -> int:
+        return 2 * self.dim
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float16)
+
+    def scores(self, codes, query: np.ndarray) -> np.ndarray:
+        # Decode in batches so a query never holds a float32 copy of the whole index
+        return np.concatenate([
+            np.asarray(codes[start:start + _BATCH], dtype=np.float32) @ query
+            for start in range(0, len(codes), _BATCH)
+        ] or [np.empty(0, dtype=np.float32)]) / self.scale
+
+    def save(self, directory: str):
+        pass
+
+    def load(self, directory: str):
+        pass
+
+
+class Int8Quantizer(Float16Quantizer):
+    """
+    Symmetric scalar quantization of unit-length vectors: round(v * 127), 1 byte per dimension.
+    """
+
+    name = "int8"
+
+    def __init__(self, dim: int):
+        super().__init__(dim)
+        self.dtype = np.int8
+        self.scale = 127
+
+    def bytes_per_vector(self) -> int:
+        return self.dim
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(np.asarray(vectors) * 127), -127, 127).astype(np.int8)
+
+
+class ProductQuantizer:
+    """
+    Product quantization: the vector is split into `subspaces` chunks and each chunk is
+    replaced by the id of its nearest of 256 trained centroids, 1 byte per chunk.
+    Scores use a per-query lookup table of chunk x centroid inner products.
+    """
+
+    name = "pq"
+
+    def __init__(self, dim: int, subspaces: int = None):
+        subspaces = min(subspaces or Config.LOCAL_VECTOR_PQ_SUBSPACES, dim)
+        while dim % subspaces:
+            subspaces -= 1
+        self.dim = dim
+        self.subspaces = subspaces
+        self.dsub = dim // subspaces
+        self.dtype = np.uint8
+        self.width = subspaces
+        self.codebooks = None
+
+    @property
+    def trained(self) -> bool:
+        return self.codebooks is not None
+
+    def bytes_per_vector(self) -> int:
+        return self.subspaces
+
+    def _split(self, vectors) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float32).reshape(len(vectors), self.subspaces, self.dsub)
+
+    @staticmethod
+    def _assign(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        # argmin ||x - c||^2 == argmax (x.c - ||c||^2 / 2)
+        bias = (centroids ** 2).sum(axis=1) / 2
+        return np.argmax(points @ centroids.T - bias, axis=1)
+
+    def train(self, vectors, iterations: int = 10, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        n = len(vectors)
+        if n < 256:
+            raise ValueError("Product quantization needs at least 256 vectors to train")
+        sample = self._split(vectors[np.sort(rng.choice(n, min(n, Config.LOCAL_VECTOR_PQ_TRAIN_SAMPLE), replace=False))])
+
+        codebooks = np.empty((self.subspaces, 256, self.dsub), dtype=np.float32)
+        for j in range(self.subspaces):
+            points = sample[:, j, :]
+            centroids = points[rng.choice(len(points), 256, replace=False)].copy()
+            for _ in range(iterations):
+                assignment = self._assign(points, centroids)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, points)
+                counts = np.bincount(assignment, minlength=256)
+                filled = counts > 0
+                centroids[filled] = sums[filled] / counts[filled, None]
+            codebooks[j] = centroids
+        self.codebooks = codebooks
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.empty((len(vectors), self.subspaces), dtype=np.uint8)
+        for start in range(0, len(vectors), _BATCH):
+            chunk = self._split(vectors[start:start + _BATCH])
+            for j in range(self.subspaces):
+                codes[start:start + len(chunk), j] = self._assign(chunk[:, j, :], self.codebooks[j])
+        return codes
+
+    def scores(self, codes, query: np.ndarray) -> np.ndarray:
+        table = np.einsum("jkd,jd->jk", self.codebooks, query.reshape(self.subspaces, self.dsub))
+        subspaces = np.arange(self.subspaces)
+        return np.concatenate([
+            table[subspaces, np.asarray(codes[start:start + _BATCH])].sum(axis=1)
+            for start in range(0, len(codes), _BATCH)
+        ] or [np.empty(0, dtype=np.float32)])
+
+    def save(self, directory: str):
+        tmp_path = os.path.join(directory, "pq_codebooks.tmp.npy")
+        np.save(tmp_path, self.codebooks)
+        os.replace(tmp_path, os.path.join(directory, "pq_codebooks.npy"))
+
+    def load(self, directory: str):
+        path = os.path.join(directory, "pq_codebooks.npy")
+        if os.path.exists(path):
+            self.codebooks = np.load(path)
+
+
+QUANTIZERS = {
+    "float16": Float16Quantizer,
+    "int8": Int8Quantizer,
+    "pq": ProductQuantizer,
+}
+
+
+def pq_trainable(rows: int) -> bool:
+    """
+    Whether a collection is large enough to train PQ codebooks (LOCAL_VECTOR_PQ_MIN_ROWS, never below 256).
+    """
+    return rows >= max(Config.LOCAL_VECTOR_PQ_MIN_ROWS, 256)
+
+
+def get_quantizer(name: str, dim: int):
+    """
+    Quantizer for LOCAL_VECTOR_QUANTIZATION; None for full-precision ("none").
+    """
+    if not name or name == "none":
+        return None
+    if name not in QUANTIZERS:
+        raise ValueError(f"Unknown vector quantization: {name}")
+    return QUANTIZERS[name](dim)
+
+
+def approximate_top(scores: np.ndarray, count: int) -> np.ndarray:
+    """
+    Indices of the `count` highest scores, best first.
+    """
+    count = min(count, len(scores))
+    if count <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, count - 1)[:count]
+    return top[np.argsort(-scores[top])]
+
+
+def quantization_report(vectors: np.ndarray, queries: np.ndarray, k: int = 10, modes=("none", "float16", "int8", "pq"),
+                        rerank_factor: int = None) -> list:
+    """
+    Bytes per vector and recall@k against exact float32 search, with and without the
+    full-precision rerank, for each quantization mode. `vectors` and `queries` are unit length.
+    PQ is reported as unavailable when there are too few vectors to train it (see pq_trainable).
+    """
+    rerank_factor = rerank_factor or Config.LOCAL_VECTOR_RERANK_FACTOR
+    vectors = np.asarray(vectors, dtype=np.float32)
+    exact = [set(approximate_top(vectors @ query, k).tolist()) for query in queries]
+
+    report = []
+    for mode in modes:
+        quantizer = get_quantizer(mode, vectors.shape[1])
+        if quantizer is None:
+            report.append({"mode": "none", "bytes_per_vector": 4 * vectors.shape[1],
+                           "recall": 1.0, "recall_reranked": 1.0})
+            continue
+        if not quantizer.trained:
+            if not pq_trainable(len(vectors)):
+                report.append({"mode": mode, "bytes_per_vector": quantizer.bytes_per_vector(),
+                               "recall": None, "recall_reranked": None, "status": "unavailable (too few rows)"})
+                continue
+            quantizer.train(vectors)
+        codes = quantizer.encode(vectors)
+
+        hits = reranked_hits = 0
+        for query, truth in zip(queries, exact):
+            approx = quantizer.scores(codes, query)
+            hits += len(truth & set(approximate_top(approx, k).tolist()))
+            shortlist = approximate_top(approx, k * rerank_factor)
+            reranked = shortlist[approximate_top(vectors[shortlist] @ query, k)]
+            reranked_hits += len(truth & set(reranked.tolist()))
+
+        total = k * len(queries)
+        report.append({
+            "mode": mode,
+            "bytes_per_vector": quantizer.bytes_per_vector(),
+            "recall": round(hits / total, 4),
+            "recall_reranked": round(reranked_hits / total, 4),
+        })
+    return report
@@ -1,22 +1,85 @@
+import sqlite3
+import threading
+import httpx
+from astrapy.exceptions import DataAPIException
 from config import Config
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_astradb import AstraDBVectorStore
+from langchain_astradb.utils.astradb import SetupMode
+from langchain_core.vectorstores import VectorStore
+from .embeddings import embedding_registry
+from .local_vectorstore import LocalVectorStore
+
+# Failures of the store or its connection (not of the LLM or prompt around it) that `reset` recovers from
+STORE_ERRORS = (DataAPIException, httpx.TransportError, sqlite3.Error)
+
+
+class VectorStoreManager:
+    """
+    One vectorstore per collection, per process: AstraDBVectorStore (and so one pooled
+    Astra client), or LocalVectorStore when VECTOR_BACKEND is "local".
+
+    Building a store does collection discovery/creation round trips; that happens once,
+    and a collection that was set up successfully is rebuilt with SetupMode.OFF if its
+    store is ever dropped (`reset`), so queries cost a single search round trip.
+    """
+
+    def __init__(self):
+        self._stores = {}
+        self._ready = set()
+        self._lock = threading.Lock()
+
+    def _create(self, collection_name: str):
+        if Config.VECTOR_BACKEND == "local":
+            return LocalVectorStore(embedding_registry.cached(), collection_name)
+        return AstraDBVectorStore(
+            embedding=embedding_registry.cached(),
+            collection_name=collection_name,
+            api_endpoint=Config.ASTRA_DB_ENDPOINT,
+            token=Config.ASTRA_DB_API_KEY,
+            setup_mode=SetupMode.OFF if collection_name in self._ready else SetupMode.SYNC,
+        )
+
+    def get(self, collection_name: str = None) -> VectorStore:
+        collection_name = collection_name or Config.ASTRA_COLLECTION
+        store = self._stores.get(collection_name)
+        if store is not None:
+            return store
+
+        with self._lock:
+            if collection_name not in self._stores:
+                self._stores[collection_name] = self._create(collection_name)
+                self._ready.add(collection_name)
+                print(f"🗄️ Vectorstore ready: {collection_name} ({Config.VECTOR_BACKEND})")
+            return self._stores[collection_name]
+
+    def reset(self, collection_name: str = None):
+        """
+        Closes and drops the cached store (e.g. after a connection error); the next `get` rebuilds it without setup.
+        """
+        collection_name = collection_name or Config.ASTRA_COLLECTION
+        with self._lock:
+            store = self._stores.pop(collection_name, None)
+        if store is not None and hasattr(store, "close"):
+            try:
+                store.close()
+            except Exception as e:
+                print(f"⚠️ Could not close vectorstore {collection_name}: {e}")
+        print(f"♻️ Vectorstore reset: {collection_name}")
+
+    def reset_on_store_error(self, error: Exception, collection_name: str = None):
+        """
+        Resets the store if `error` came from it (STORE_ERRORS); other failures leave it cached.
+        """
+        if isinstance(error, STORE_ERRORS):
+            self.reset(collection_name)
+
+
+vectorstore_manager = VectorStoreManager()
+
 
 def get_vectorstore():
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-mpnet-base-v2")
-    return AstraDBVectorStore(
-        embedding=embeddings,
-        collection_name=Config.ASTRA_COLLECTION,
-        api_endpoint=Config.ASTRA_DB_ENDPOINT,
-        token=Config.ASTRA_DB_API_KEY,
-    )
+    return vectorstore_manager.get(Config.ASTRA_COLLECTION)
 
 # ✅ For Chat Cache Collection
 def get_chat_cache_vectorstore():
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-mpnet-base-v2")
-    return AstraDBVectorStore(
-        embedding=embeddings,
-        collection_name="chat_cache",  # fixed collection for all cached chats
-        api_endpoint=Config.ASTRA_DB_ENDPOINT,
-        token=Config.ASTRA_DB_API_KEY,
-    )
\ No newline at end of file
+    return vectorstore_manager.get("chat_cache")  # fixed collection for all cached chats
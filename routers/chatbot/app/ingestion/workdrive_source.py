@@ -0,0 +1,152 @@
+import asyncio
+import io
+from pypdf import PdfReader
+from langchain_core.documents import Document
+from config import Config
+from constants import status_codes as sc
+from utils.zoho_client import zoho_client
+from utils.zoho_crawler import FolderCrawler
+from utils.zoho_folder_helpers import fetch_root_folders
+from .chunker import chunk_documents_by_section
+from ..db.vectorstore import get_vectorstore, vectorstore_manager
+
+
+async def iter_workdrive_pdfs(crawler: FolderCrawler):
+    """
+    Async generator of PDF file records across the user's incoming folders and My Folders.
+    """
+    roots_by_source, errors = await fetch_root_folders(crawler)
+    for error in errors:
+        print(f"⚠️ WorkDrive root listing failed: {error}")
+
+    roots = [folder for folders in roots_by_source.values() if folders for folder in folders]
+    async for visit in crawler.walk(roots):
+        for file in visit["files"]:
+            attributes = file.get("attributes", {})
+            name = attributes.get("name", "")
+            if file.get("type") == "files" and name.endswith(".pdf") and attributes.get("download_url"):
+                yield {
+                    "id": file.get("id"),
+                    "name": name,
+                    "download_url": attributes["download_url"],
+                    "url": attributes.get("permalink", ""),
+                    "folder_name": visit["name"],
+                }
+
+
+def parse_pdf_bytes(data: bytes, record: dict) -> list:
+    """
+    Parses an in-memory PDF into one Document per page (no temp files).
+    """
+    reader = PdfReader(io.BytesIO(data))
+    docs = []
+    for page_number, page in enumerate(reader.pages):
+        docs.append(Document(
+            page_content=page.extract_text() or "",
+            metadata={
+                "source": "workdrive",
+                "filename": record["name"],
+                "file_id": record["id"],
+                "url": record["url"],
+                "folder_name": record["folder_name"],
+                "page": page_number,
+            }
+        ))
+    return docs
+
+
+async def ingest_user_pdfs_from_workdrive(user_id: str, access_token: str) -> dict:
+    """
+    Crawl → download → parse → chunk → vectorstore, as one pipelined operation.
+
+    PDFs are downloaded concurrently into memory while the crawl is still running,
+    and chunks are written to the vectorstore in batches as they are produced.
+    """
+    headers = zoho_client.auth_headers(access_token)
+    crawler = FolderCrawler(headers, user_id=user_id)
+    workers = Config.WORKDRIVE_INGEST_CONCURRENCY
+
+    files_queue = asyncio.Queue(maxsize=workers * 2)
+    chunks_queue = asyncio.Queue(maxsize=workers * 2)
+    stats = {"files": 0, "pages": 0, "chunks": 0, "failed": []}
+
+    async def produce():
+        try:
+            async for record in iter_workdrive_pdfs(crawler):
+                await files_queue.put(record)
+        finally:
+            for _ in range(workers):
+                await files_queue.put(None)
+
+    async def process():
+        while (record := await files_queue.get()) is not None:
+            try:
+                res = await zoho_client.aget(
+                    record["download_url"], access_token=access_token, user_id=user_id, follow_redirects=True
+                )
+                if res.status_code != sc.HTTP_OK:
+                    raise Exception(f"download failed ({res.status_code})")
+
+                docs = await asyncio.to_thread(parse_pdf_bytes, res.content, record)
+                chunks = chunk_documents_by_section(docs, user_id=user_id)
+                # Stable ids, so re-ingesting a file overwrites its chunks instead of duplicating them;
+                # chunk_index lets the write stage drop the ones past its new end
+                for index, chunk in enumerate(chunks):
+                    chunk.metadata = {**chunk.metadata, "chunk_index": index}
+                ids = [f"{user_id}:{record['id']}:{index}" for index in range(len(chunks))]
+                stats["files"] += 1
+                stats["pages"] += len(docs)
+                await chunks_queue.put((record["id"], ids, chunks))
+                print(f"📄 Parsed {record['name']}: {len(docs)} pages, {len(chunks)} chunks")
+            except Exception as e:
+                print(f"❌ Failed to ingest {record['name']}: {e}")
+                stats["failed"].append(record["name"])
+
+    async def write():
+        vectorstore = await asyncio.to_thread(get_vectorstore)
+
+        def store(batch, batch_ids, chunk_counts):
+            vectorstore.add_documents(batch, ids=batch_ids)
+            # A re-ingested file that now has fewer chunks leaves its old tail behind; drop it
+            for file_id, count in chunk_counts.items():
+                vectorstore.delete_by_metadata_filter(
+                    {"user_id": user_id, "file_id": file_id, "chunk_index": {"$gte": count}}
+                )
+
+        async def add(batch, batch_ids, chunk_counts):
+            try:
+                await asyncio.to_thread(store, batch, batch_ids, chunk_counts)
+            except Exception as e:
+                vectorstore_manager.reset_on_store_error(e)  # rebuilt on next use if its connection broke
+                raise
+            stats["chunks"] += len(batch)
+
+        batch, batch_ids, chunk_counts = [], [], {}
+        while (item := await chunks_queue.get()) is not None:
+            file_id, ids, chunks = item
+            batch.extend(chunks)
+            batch_ids.extend(ids)
+            chunk_counts[file_id] = len(chunks)
+            if len(batch) >= Config.WORKDRIVE_INGEST_BATCH_SIZE:
+                await add(batch, batch_ids, chunk_counts)
+                batch, batch_ids, chunk_counts = [], [], {}
+        if batch:
+            await add(batch, batch_ids, chunk_counts)
+
+    async def crawl_and_parse():
+        try:
+            await asyncio.gather(produce(), *(process() for _ in range(workers)))
+        finally:
+            await chunks_queue.put(None)
+
+    pipeline = asyncio.ensure_future(crawl_and_parse())
+    try:
+        await write()
+        await pipeline
+    finally:
+        pipeline.cancel()
+
+    return {
+        "message": f"Ingested {stats['files']} WorkDrive PDFs ({stats['pages']} pages) and {stats['chunks']} chunks.",
+        "failed": stats["failed"]
+    }
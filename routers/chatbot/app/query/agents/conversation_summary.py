@@ -0,0 +1,89 @@
+# query/agents/conversation_summary.py
+
+from langchain_core.messages import SystemMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_google_genai import ChatGoogleGenerativeAI
+from config import Config
+from utils.single_flight import SingleFlight
+from ...db.chat_history import get_chat_turns, load_chat_turns, turn_messages
+from ...db.chat_summary import get_chat_summary, load_chat_summary, save_chat_summary
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You maintain a running summary of a conversation between a user and an assistant. "
+               "Keep names, emails, dates, times, decisions and open requests; drop small talk. "
+               "Reply with the updated summary only, in at most {max_words} words."),
+    ("human", "Current summary:\n{summary}\n\nNew conversation lines:\n{lines}\n\nUpdated summary:")
+])
+
+_folds = SingleFlight()
+
+
+def _format_lines(turns) -> str:
+    return "\n".join(f"User: {human.content}\nAssistant: {ai.content}" for _, human, ai in turns)
+
+
+async def fold_history(user_id: str):
+    """
+    Folds the user's turns older than the last CHAT_SUMMARY_KEEP_TURNS into the rolling summary,
+    oldest first and at most CHAT_SUMMARY_MAX_FOLD turns per LLM call, until it has caught up.
+
+    The base summary is read from MongoDB, and each step is only stored if no other worker
+    has folded further meanwhile; if one has, this fold stops.
+    """
+    state = await load_chat_summary(user_id)
+    before = None
+    if Config.CHAT_SUMMARY_KEEP_TURNS:
+        kept = await load_chat_turns(user_id, Config.CHAT_SUMMARY_KEEP_TURNS, after=state["until"])
+        if len(kept) < Config.CHAT_SUMMARY_KEEP_TURNS:
+            return
+        before = kept[0][0]
+
+    llm = ChatGoogleGenerativeAI(model=Config.LLM_MODEL, google_api_key=Config.GOOGLE_API_KEY, temperature=0)
+    chain = SUMMARY_PROMPT | llm | StrOutputParser()
+    folded = 0
+    while to_fold := await load_chat_turns(
+        user_id, Config.CHAT_SUMMARY_MAX_FOLD, after=state["until"], before=before, oldest=True
+    ):
+        summary = await chain.ainvoke({
+            "summary": state["summary"] or "(none)",
+            "lines": _format_lines(to_fold),
+            "max_words": Config.CHAT_SUMMARY_MAX_WORDS,
+        })
+        state = {"summary": summary.strip(), "until": to_fold[-1][0]}
+        if not await save_chat_summary(user_id, state["summary"], state["until"]):
+            print(f"🗜️ {user_id}'s conversation summary was advanced elsewhere; stopping this fold")
+            break
+        folded += len(to_fold)
+
+    if folded:
+        print(f"🗜️ Folded {folded} turn(s) into {user_id}'s conversation summary")
+
+
+async def _fold_quietly(user_id: str):
+    try:
+        await fold_history(user_id)
+    except Exception as e:
+        print(f"⚠️ Could not summarize conversation for {user_id}: {e}")
+
+
+async def get_agent_history(user_id: str) -> list:
+    """
+    `chat_history` for the agent prompt: the rolling summary plus the turns not folded into it yet.
+
+    Once more than CHAT_SUMMARY_KEEP_TURNS + CHAT_SUMMARY_FOLD_EVERY turns are unsummarized, the
+    older ones are folded in the background, so the prompt stays roughly the same size however
+    long the conversation gets.
+    """
+    state = await get_chat_summary(user_id)
+    turns = await get_chat_turns(user_id)
+    if state["until"] is not None:
+        turns = [turn for turn in turns if turn[0] > state["until"]]
+
+    if len(turns) > Config.CHAT_SUMMARY_KEEP_TURNS + Config.CHAT_SUMMARY_FOLD_EVERY:
+        _folds.start(user_id, lambda: _fold_quietly(user_id))
+
+    history = turn_messages(turns)
+    if state["summary"]:
+        history.insert(0, SystemMessage(content=f"Summary of the earlier conversation:\n{state['summary']}"))
+    return history
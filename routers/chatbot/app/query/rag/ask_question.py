@@ -3,7 +3,7 @@ from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
 from langchain_google_genai import ChatGoogleGenerativeAI
 from config import Config
-from ...db.vectorstore import get_vectorstore  # 🧠 Shared vectorstore from ingestion module
+from ...db.vectorstore import get_vectorstore, vectorstore_manager  # 🧠 Shared vectorstore from ingestion module
 
 def ask_question(query: str, user_id: str) -> dict:
     print(f"\n Received query: {query}")
@@ -12,7 +12,11 @@ def ask_question(query: str, user_id: str) -> dict:
     vectorstore = get_vectorstore()
     print("Vectorstore initialized.")
 
-    retriever = vectorstore.as_retriever(search_type="similarity", search_kwargs={"k": 5})
+    # Shared documents (ingested from Docs/) plus this user's own WorkDrive chunks
+    retriever = vectorstore.as_retriever(
+        search_type="similarity",
+        search_kwargs={"k": 5, "filter": {"$or": [{"source": "admin"}, {"user_id": user_id}]}}
+    )
     print("Retriever created with top-k = 5")
 
     is_summary = any(word in query.lower() for word in ["summarize", "summary", "explain", "overview"])
@@ -52,7 +56,12 @@ def ask_question(query: str, user_id: str) -> dict:
     )
     print("RetrievalQA chain constructed.")
 
-    result = qa_chain.invoke(query)
+    try:
+        result = qa_chain.invoke(query)
+    except Exception as e:
+        # A broken store connection is rebuilt (without setup round trips) on the next question
+        vectorstore_manager.reset_on_store_error(e)
+        raise
     print("QA chain invoked successfully.")
     print(f"Answer: {result['result']}")
 
@@ -14,7 +14,10 @@ from langchain.prompts import ChatPromptTemplate
 from langchain.chains import LLMChain
 from langchain_core.output_parsers import StrOutputParser
 
-from ..db.chat_history import save_chat_log, get_chat_history
+from ..db.chat_history import save_chat_log
+from ..query.agents.conversation_summary import get_agent_history
+from ..ingestion.workdrive_source import ingest_user_pdfs_from_workdrive
+from utils.token_manager import token_manager, TokenRefreshError
 
 chat_router = APIRouter(prefix="/Chat", tags=["ChatBot"])
 def extract_tool_name(response: dict):
@@ -72,10 +75,10 @@ async def ask_route(request: Request, query: str = Form(...), user_id: str = Que
             print("🚀 Invoking agent with query...",query)
 
             # Before invoking the agent
-            chat_history = get_chat_history(user_id)
+            chat_history = await get_agent_history(user_id)
 
             # print("this is our executor",executor)
-            result = executor.invoke({
+            result = await executor.ainvoke({
                 "input": query,
                 "context": "",  # Placeholder for now
                 "chat_history": chat_history
@@ -88,7 +91,7 @@ async def ask_route(request: Request, query: str = Form(...), user_id: str = Que
                 output = result.get("output", "")
 
                 # ✅ Always store what the agent replied, even if it's a clarifying question
-                save_chat_log(
+                await save_chat_log(
                     user_id=user_id,
                     user_input=query,
                     bot_response=output,  # Directly from agent result
@@ -106,11 +109,11 @@ async def ask_route(request: Request, query: str = Form(...), user_id: str = Que
 
                         for tool in tools:
                             if tool.name == tool_name:
-                                response = tool.invoke(tool_input)
+                                response = await tool.ainvoke(tool_input)
                                 tool_executed = True
                                 print(f"✅ Tool '{tool_name}' executed. Response:", response)
                                 # ✅ Save tool response as chat log
-                                save_chat_log(
+                                await save_chat_log(
                                     user_id=user_id,
                                     user_input=query,
                                     bot_response=str(response),
@@ -159,7 +162,7 @@ async def ask_route(request: Request, query: str = Form(...), user_id: str = Que
             print("\n🟡 Step 4: Tool not required → Running RAG...")
             rag_output = ask_question(query, user_id)
             output = rag_output["result"]
-            save_chat_log(
+            await save_chat_log(
                 user_id=user_id,
                 user_input=query,
                 bot_response=output,
@@ -174,3 +177,21 @@ async def ask_route(request: Request, query: str = Form(...), user_id: str = Que
         import traceback
         traceback.print_exc()
         return JSONResponse(content={"error": str(e)}, status_code=500)
+
+
+@chat_router.post("/ingest-workdrive", response_class=JSONResponse)
+async def ingest_workdrive_route(user_id: str = Query(...)):
+    """
+    Streams the user's WorkDrive PDFs straight into the vectorstore.
+    """
+    try:
+        access_token = await token_manager.aget_access_token(user_id)
+    except TokenRefreshError:
+        return JSONResponse({"error": "User not logged in or token missing"}, status_code=401)
+
+    try:
+        result = await ingest_user_pdfs_from_workdrive(user_id, access_token)
+        return JSONResponse(result)
+    except Exception as e:
+        print(f"\n❌ WorkDrive ingestion failed: {str(e)}")
+        return JSONResponse(content={"error": str(e)}, status_code=500)
@@ -26,7 +26,7 @@ class MeetingInput(BaseModel):
 
 # 🛠️ StructuredTool factory
 def make_tool(user_id: str) -> StructuredTool:
-    def book(title: str, start_time: str, duration_minutes: int, attendees: list[str]):
+    async def book(title: str, start_time: str, duration_minutes: int, attendees: list[str]):
         print("🔥 BOOK_MEETING tool triggered with:", title, start_time, duration_minutes, attendees)
 
         parsed_time = parse_datetime_from_query(start_time)
@@ -47,7 +47,7 @@ def make_tool(user_id: str) -> StructuredTool:
             attendees=attendees
         )
 
-        result = wrapped_booking_tool(json.dumps(data.model_dump()), user_id)
+        result = await wrapped_booking_tool(json.dumps(data.model_dump()), user_id)
         print("Tool booking data:", data.model_dump())
         print("Calling wrapped_booking_tool with JSON:", json.dumps(data.model_dump()))
         # ✅ Convert to string response
@@ -62,8 +62,9 @@ def make_tool(user_id: str) -> StructuredTool:
 
         return str(result)  # fallback for non-dict results
 
+    # Async-only tool: the agent and callers use ainvoke, so no DB/HTTP call blocks the event loop
     return StructuredTool.from_function(
-        func=book,
+        coroutine=book,
         name="BOOK_MEETING",
         description=(
             "Schedules a meeting using Zoho Calendar.\n"
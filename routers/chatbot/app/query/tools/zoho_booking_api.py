@@ -1,67 +1,25 @@
 import json
 import re
-import requests
 import urllib.parse
 from datetime import datetime, timedelta, timezone
 from config import Config
-from utils.shared import save_user_tokens, get_user_tokens
-
-#  Refresh token and get calendar ID
-def get_access_token_for_user(user_id: str):
-    user_record = get_user_tokens(user_id)
-    if not user_record:
-        raise Exception(" User not authorized")
-
-    refresh_token = user_record.get("refresh_token")
-    if not refresh_token:
-        raise Exception(" No refresh token found")
-
-    token_url = f"{Config.ZOHO_ACCOUNTS_URL}/oauth/v2/token"
-    data = {
-        'refresh_token': refresh_token,
-        'client_id': Config.CLIENT_ID,
-        'client_secret': Config.CLIENT_SECRET,
-        'grant_type': 'refresh_token'
-    }
-    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-    res = requests.post(token_url, data=data, headers=headers)
-
-    if res.status_code != 200:
-        raise Exception(f" Failed to refresh token: {res.text}")
+from constants import status_codes as sc
+from utils.zoho_client import zoho_client
+from utils.token_manager import token_manager
+from utils.zoho_calendars import get_calendar_id, invalidate_calendars
 
-    tokens = res.json()
-    access_token = tokens.get("access_token")
-    if not access_token:
-        raise Exception("No access token received")
+#  Get a valid access token (refreshed only near expiry) and the cached calendar ID
+async def get_access_token_for_user(user_id: str):
+    access_token = await token_manager.aget_access_token(user_id)
 
-    calendar_id = get_calendar_id(access_token)
-    print(f"Refreshed token & got calendar ID: {calendar_id}")
-
-    save_user_tokens(
-        user_id=user_id,
-        email=user_record.get("email", ""),
-        name=user_record.get("name", ""),
-        access_token=access_token,
-        refresh_token=refresh_token
-    )
-    print(f"Got access_token for {user_record.get('email')}: {access_token[:6]}...")
+    calendar_id = await get_calendar_id(user_id, access_token)
+    print(f"Got access_token & calendar ID: {calendar_id}")
 
     return access_token, calendar_id
 
-#  Fetch first calendar ID
-def get_calendar_id(access_token: str):
-    url = "https://calendar.zoho.com/api/v1/calendars"
-    headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
-    response = requests.get(url, headers=headers)
-
-    print("Calendars JSON:", response.json())  # 👈 See what's available
-
-    calendars = response.json().get("calendars", [])
-    return calendars[0]["uid"] if calendars else None
-
 
 # Book meeting using Zoho API
-def book_zoho_meeting(calendar_id, access_token, title, start_time, duration_minutes, attendees):
+async def book_zoho_meeting(calendar_id, access_token, title, start_time, duration_minutes, attendees, user_id=None):
     start = datetime.fromisoformat(start_time).astimezone(timezone.utc)
     end = start + timedelta(minutes=duration_minutes)
 
@@ -81,13 +39,19 @@ def book_zoho_meeting(calendar_id, access_token, title, start_time, duration_min
     }
 
     encoded_eventdata = urllib.parse.quote(json.dumps(event_data))
-    url = f"https://calendar.zoho.com/api/v1/calendars/{calendar_id}/events?eventdata={encoded_eventdata}"
+    url = f"{Config.ZOHO_CALENDAR_URL}/api/v1/calendars/{calendar_id}/events?eventdata={encoded_eventdata}"
     headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
     print("Booking event data:\n", json.dumps(event_data, indent=2))
     print("Requesting URL:", url)
-    print("Headers:", headers)
 
-    response = requests.post(url, headers=headers)
+    response = await zoho_client.apost(url, headers=headers, user_id=user_id)
+
+    if response.status_code == sc.HTTP_NOT_FOUND and user_id:
+        # Cached calendar no longer exists: drop it and retry once with a freshly fetched one
+        await invalidate_calendars(user_id)
+        calendar_id = await get_calendar_id(user_id, access_token)
+        url = f"{Config.ZOHO_CALENDAR_URL}/api/v1/calendars/{calendar_id}/events?eventdata={encoded_eventdata}"
+        response = await zoho_client.apost(url, headers=headers, user_id=user_id)
 
     if response.status_code == 200:
         print("Meeting booked successfully.")
@@ -98,7 +62,7 @@ def book_zoho_meeting(calendar_id, access_token, title, start_time, duration_min
 
 
 #  Tool function wrapper
-def wrapped_booking_tool(prompt: str, user_id: str):
+async def wrapped_booking_tool(prompt: str, user_id: str):
     try:
         print("Booking Zoho Calendar meeting...")
         print("Prompt received:", prompt)
@@ -106,16 +70,17 @@ def wrapped_booking_tool(prompt: str, user_id: str):
         meeting_data = json.loads(prompt)
         print("Parsed meeting data:", meeting_data)
 
-        access_token, calendar_id = get_access_token_for_user(user_id)
+        access_token, calendar_id = await get_access_token_for_user(user_id)
         print(f"Using calendar: {calendar_id}, access_token: {access_token[:5]}...")
 
-        result = book_zoho_meeting(
+        result = await book_zoho_meeting(
             calendar_id=calendar_id,
             access_token=access_token,
             title=meeting_data["title"],
             start_time=meeting_data["start_time"],
             duration_minutes=meeting_data["duration_minutes"],
-            attendees=meeting_data["attendees"]
+            attendees=meeting_data["attendees"],
+            user_id=user_id
         )
 
         print("Zoho API booking result:", result)
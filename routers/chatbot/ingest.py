@@ -1,4 +1,11 @@
-from app.ingestion.ingest_common import ingest_common_pdfs_from_local
+import os
+import sys
+
+# Run as `python routers/chatbot/ingest.py`: put the repo root first so `config` is the
+# root Config (not routers/chatbot/config.py) and `utils` is importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from routers.chatbot.app.ingestion.ingest_common import ingest_common_pdfs_from_local
 
 def main():
     folder_path ="routers/chatbot/Docs"
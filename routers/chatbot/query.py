@@ -1,18 +1,19 @@
 # query.py
 import sys, os, json, re, urllib.parse
 from datetime import datetime, timedelta
-import requests
 from config import Config
 from fastapi import APIRouter, Request, Query, Form
 from fastapi.responses import HTMLResponse, JSONResponse
 from langchain_astradb import AstraDBVectorStore
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from routers.chatbot.app.db.embeddings import embedding_registry
 from langchain.chains import RetrievalQA
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import PromptTemplate
 from langchain.agents import initialize_agent, AgentType
 from langchain.tools import Tool
-from utils.shared import save_user_tokens, delete_user_tokens, get_user_tokens
+from utils.zoho_client import zoho_client
+from utils.token_manager import token_manager
+from utils.zoho_calendars import get_calendar_id, invalidate_calendars
 from langchain.agents import create_tool_calling_agent, AgentExecutor
 from langchain.prompts.chat import ChatPromptTemplate, MessagesPlaceholder
 from langchain.schema import SystemMessage, HumanMessage
@@ -57,17 +58,17 @@ class MeetingInput(BaseModel):
                 raise ValueError("Invalid format for attendees. Must be a list of emails.")
         return v
 def make_structured_booking_tool(user_id: str):
-    def book(title: str, start_time: str, duration_minutes: int, attendees: list[str]):
+    async def book(title: str, start_time: str, duration_minutes: int, attendees: list[str]):
         data = MeetingInput(
             title=title,
             start_time=start_time,
             duration_minutes=duration_minutes,
             attendees=attendees
         )
-        return _wrapped_booking(json.dumps(data.dict()), user_id)
+        return await _wrapped_booking(json.dumps(data.dict()), user_id)
 
     return StructuredTool.from_function(
-        func=book,
+        coroutine=book,
         name="BOOK_MEETING",
         description=(
         "Schedules a meeting using Zoho Calendar. "
@@ -83,9 +84,8 @@ def make_structured_booking_tool(user_id: str):
 
 # AstraDB Vectorstore
 def get_vectorstore(user_id: str):
-    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
     return AstraDBVectorStore(
-        embedding=embeddings,
+        embedding=embedding_registry.get("all-MiniLM-L6-v2"),
         collection_name=Config.ASTRA_COLLECTION,
         api_endpoint=Config.ASTRA_DB_ENDPOINT,
         token=Config.ASTRA_DB_API_KEY,
@@ -125,65 +125,17 @@ def ask_question(query: str, user_id: str):
     result = qa_chain.invoke(query)
     return result["result"]
 
-# Get Calendar ID
-def get_calendar_id(access_token: str):
-    print("📡 Calling Zoho Calendar API to fetch calendar ID")
-    url = "https://calendar.zoho.com/api/v1/calendars"
-    headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
-    response = requests.get(url, headers=headers)
-
-    if response.status_code != 200:
-        raise Exception(f"Failed to fetch calendars: {response.text}")
-
-    calendars = response.json().get("calendars", [])
-    if not calendars:
-        raise Exception("No calendars found")
-
-    return calendars[0]["uid"]
-
-# Refresh access token
-def get_access_token_for_user(user_id: str):
-    user_record = get_user_tokens(user_id)
-    if not user_record:
-        raise Exception("❌ User not authorized")
+# Valid access token (refreshed only near expiry) and cached calendar ID
+async def get_access_token_for_user(user_id: str):
+    access_token = await token_manager.aget_access_token(user_id)
 
-    refresh_token = user_record.get("refresh_token")
-    if not refresh_token:
-        raise Exception("❌ No refresh token found")
-
-    token_url = f"{Config.ZOHO_ACCOUNTS_URL}/oauth/v2/token"
-    data = {
-        'refresh_token': refresh_token,
-        'client_id': Config.CLIENT_ID,
-        'client_secret': Config.CLIENT_SECRET,
-        'grant_type': 'refresh_token'
-    }
-    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-    res = requests.post(token_url, data=data, headers=headers)
-
-    if res.status_code != 200:
-        raise Exception(f"❌ Failed to refresh token: {res.text}")
-
-    tokens = res.json()
-    access_token = tokens.get("access_token")
-    if not access_token:
-        raise Exception("❌ No access token received")
-
-    calendar_id = get_calendar_id(access_token)
-    print(f"✅ Refreshed token & got calendar ID: {calendar_id}")
-
-    save_user_tokens(
-        user_id=user_id,
-        email=user_record.get("email", ""),
-        name=user_record.get("name", ""),
-        access_token=access_token,
-        refresh_token=refresh_token
-    )
+    calendar_id = await get_calendar_id(user_id, access_token)
+    print(f"✅ Got access token & calendar ID: {calendar_id}")
 
     return access_token, calendar_id
 
 # Tool wrapper
-def _wrapped_booking(prompt: str, user_id: str):
+async def _wrapped_booking(prompt: str, user_id: str):
     import json, re
 
     try:
@@ -224,14 +176,15 @@ def _wrapped_booking(prompt: str, user_id: str):
         duration_minutes = meeting_data["duration_minutes"]
         attendees = meeting_data["attendees"]
 
-        access_token, calendar_id = get_access_token_for_user(user_id)
-        return book_zoho_meeting(
+        access_token, calendar_id = await get_access_token_for_user(user_id)
+        return await book_zoho_meeting(
             calendar_id=calendar_id,
             access_token=access_token,
             title=title,
             start_time=start_time,
             duration_minutes=duration_minutes,
             attendees=attendees,
+            user_id=user_id,
         )
 
     except json.JSONDecodeError as e:
@@ -242,7 +195,7 @@ def _wrapped_booking(prompt: str, user_id: str):
 # Book meeting via Zoho API
 from datetime import timezone
 
-def book_zoho_meeting(calendar_id, access_token, title, start_time, duration_minutes, attendees):
+async def book_zoho_meeting(calendar_id, access_token, title, start_time, duration_minutes, attendees, user_id=None):
     print("📨 Booking Zoho Calendar meeting...")
 
     # Parse and convert to UTC
@@ -266,9 +219,16 @@ def book_zoho_meeting(calendar_id, access_token, title, start_time, duration_min
     }
 
     encoded_eventdata = urllib.parse.quote(json.dumps(event_data))
-    url = f"https://calendar.zoho.com/api/v1/calendars/{calendar_id}/events?eventdata={encoded_eventdata}"
+    url = f"{Config.ZOHO_CALENDAR_URL}/api/v1/calendars/{calendar_id}/events?eventdata={encoded_eventdata}"
     headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
-    response = requests.post(url, headers=headers)
+    response = await zoho_client.apost(url, headers=headers, user_id=user_id)
+
+    if response.status_code == 404 and user_id:
+        # Cached calendar no longer exists: drop it and retry once with a freshly fetched one
+        await invalidate_calendars(user_id)
+        calendar_id = await get_calendar_id(user_id, access_token)
+        url = f"{Config.ZOHO_CALENDAR_URL}/api/v1/calendars/{calendar_id}/events?eventdata={encoded_eventdata}"
+        response = await zoho_client.apost(url, headers=headers, user_id=user_id)
 
     if response.status_code == 200:
         print("✅ Meeting booked successfully.")
@@ -292,8 +252,8 @@ async def ask_route(request: Request, query: str = Form(...), user_id: str = Que
         }
 
         # 👉 ONLY run this if you want to test without the LLM
-        booking_tool = make_structured_booking_tool(user_id).func
-        result = booking_tool(**test_booking_data)
+        booking_tool = make_structured_booking_tool(user_id).coroutine
+        result = await booking_tool(**test_booking_data)
         return HTMLResponse(f"<pre>{result}</pre>")
 
         tools = [make_structured_booking_tool(user_id)]
@@ -306,7 +266,7 @@ async def ask_route(request: Request, query: str = Form(...), user_id: str = Que
         agent = create_tool_calling_agent(llm=llm, tools=tools, prompt=prompt)
         executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
 
-        result = executor.invoke({"input": query, "chat_history": []})
+        result = await executor.ainvoke({"input": query, "chat_history": []})
 
         return HTMLResponse(f"""
             <html><body>
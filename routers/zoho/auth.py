@@ -2,22 +2,45 @@ from fastapi import APIRouter, Request
 from fastapi.responses import RedirectResponse, HTMLResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 from config import Config
-import requests
-from jose import jwt
+from jose import JWTError
 from constants import response_messages as msg
 from constants import status_codes as sc
-from utils.shared import save_user_tokens, delete_user_tokens, get_user_tokens
+from utils.shared import delete_user_tokens
+from utils.zoho_client import zoho_client
+from utils.token_manager import token_manager, TokenRefreshError
+from utils.zoho_calendars import invalidate_calendars
+from utils.session_store import session_store
+from utils.jwks_cache import jwks_cache
 
 
 templates = Jinja2Templates(directory="templates")
 router = APIRouter(tags=["Zoho Auth"])
 
-# In-memory session store (for PoC only!)
-user_sessions = {}
+
+async def get_session_user(request: Request):
+    """
+    The logged-in user ({sub, email, name}) of this browser session, or None.
+    """
+    return await session_store.get(session_store.session_id_from_request(request))
+
+
+async def get_logged_in_user(request: Request):
+    """
+    Session user plus a valid `access_token`, or None when not logged in.
+    """
+    user = await get_session_user(request)
+    if not user:
+        return None
+    try:
+        access_token = await token_manager.aget_access_token(user["sub"])
+    except TokenRefreshError:
+        return None
+    return {**user, "access_token": access_token}
+
 
 @router.get("/", response_class=HTMLResponse)
 async def home(request: Request):
-    user = user_sessions.get("current_user")
+    user = await get_session_user(request)
     if user:
         return HTMLResponse(
             f"""
@@ -74,7 +97,7 @@ async def callback(code: str = None):
         'redirect_uri': Config.REDIRECT_URI,
     }
     headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-    res = requests.post(token_url, data=data, headers=headers)
+    res = await zoho_client.apost(token_url, data=data, headers=headers)
 
     if res.status_code != sc.HTTP_OK:
         return HTMLResponse(f"{msg.TOKEN_EXCHANGE_FAILED}: {res.text}", status_code=sc.HTTP_BAD_REQUEST)
@@ -87,10 +110,13 @@ async def callback(code: str = None):
     if not access_token:
         return HTMLResponse(msg.NO_ACCESS_TOKEN, status_code=sc.HTTP_BAD_REQUEST)
 
-    user_info = {'access_token': access_token}
+    user_info = {}
 
     if id_token:
-        decoded = jwt.get_unverified_claims(id_token)
+        try:
+            decoded = await jwks_cache.verify_id_token(id_token, access_token)
+        except JWTError as e:
+            return HTMLResponse(f"{msg.INVALID_ID_TOKEN}: {e}", status_code=sc.HTTP_BAD_REQUEST)
         user_info['email'] = decoded.get('email', 'No email')
         user_info['sub'] = decoded.get('sub', 'No sub')
         user_info['name'] = decoded.get('name', 'No Name')
@@ -99,17 +125,20 @@ async def callback(code: str = None):
         user_info['sub'] = 'No sub'
         user_info['name'] = 'No Name'
 
-    user_sessions["current_user"] = user_info
-    
-    save_user_tokens(
+    await token_manager.store(
         user_id=user_info["sub"],
         email=user_info["email"],
         name=user_info["name"],
         access_token=access_token,
-        refresh_token=refresh_token
+        refresh_token=refresh_token,
+        expires_in=tokens.get("expires_in")
     )
+    # New grant (possibly another account or scopes): re-discover calendars on the next booking
+    await invalidate_calendars(user_info["sub"])
 
-    return RedirectResponse("/")
+    response = RedirectResponse("/")
+    session_store.set_cookie(response, await session_store.create(user_info))
+    return response
 
 # @router.get("/callback")
 # async def callback(code: str = None):
@@ -184,8 +213,8 @@ async def callback(code: str = None):
 
 
 @router.get("/get-access-token")
-async def get_access_token():
-    user = user_sessions.get("current_user")
+async def get_access_token(request: Request):
+    user = await get_logged_in_user(request)
     if not user:
         return HTMLResponse("Not logged in.", status_code=401)
     return {"access_token": user.get("access_token")}
@@ -197,60 +226,34 @@ async def get_access_token():
 #     return RedirectResponse("/")
 
 @router.get("/logout")
-async def logout():
-    user = user_sessions.get("current_user")
+async def logout(request: Request):
+    session_id = session_store.session_id_from_request(request)
+    user = await session_store.get(session_id)
     if user:
         user_id = user.get("sub")
-        delete_user_tokens(user_id)
-    user_sessions.pop("current_user", None)
-    return RedirectResponse("/")
+        await delete_user_tokens(user_id)
+        token_manager.invalidate(user_id)
+        await invalidate_calendars(user_id, stored=False)
+    if session_id:
+        await session_store.delete(session_id)
+    response = RedirectResponse("/")
+    session_store.clear_cookie(response)
+    return response
 
 @router.get("/api/user-access-token")
 async def api_user_access_token(user_id: str):
-    # Fetch from DB
-    user_record = get_user_tokens(user_id)
-    if not user_record:
-        return JSONResponse({"error": "User not found or not authorized"}, status_code=401)
-
-    refresh_token = user_record.get("refresh_token")
-    if not refresh_token:
-        return JSONResponse({"error": "No refresh token found"}, status_code=400)
-
-    # Prepare refresh request
-    token_url = f"{Config.ZOHO_ACCOUNTS_URL}/oauth/v2/token"
-    data = {
-        'refresh_token': refresh_token,
-        'client_id': Config.CLIENT_ID,
-        'client_secret': Config.CLIENT_SECRET,
-        'grant_type': 'refresh_token'
-    }
-    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-    res = requests.post(token_url, data=data, headers=headers)
-
-    if res.status_code != sc.HTTP_OK:
-        return JSONResponse({"error": f"Failed to refresh: {res.text}"}, status_code=400)
-
-    tokens = res.json()
-    new_access_token = tokens.get("access_token")
-
-    if not new_access_token:
-        return JSONResponse({"error": "No new access token received"}, status_code=400)
-
-    # Update DB with new access token
-    save_user_tokens(
-        user_id=user_id,
-        email=user_record.get("email", ""),
-        name=user_record.get("name", ""),
-        access_token=new_access_token,
-        refresh_token=refresh_token  # We keep the same refresh token
-    )
+    # Cached token while it is valid; refreshed (once, for all concurrent callers) near expiry
+    try:
+        access_token = await token_manager.aget_access_token(user_id)
+    except TokenRefreshError as e:
+        return JSONResponse({"error": str(e)}, status_code=e.status_code)
 
-    return {"access_token": new_access_token}
+    return {"access_token": access_token}
 
 
 @router.get("/get-user-id")
-async def get_user_id():
-    user = user_sessions.get("current_user")
+async def get_user_id(request: Request):
+    user = await get_session_user(request)
     if not user:
         return JSONResponse({"error": "Not logged in"}, status_code=401)
     
@@ -1,238 +1,224 @@
+import asyncio
 import json
-from fastapi import APIRouter
-from fastapi.responses import HTMLResponse, JSONResponse
-import requests
-from config import Config
-from routers.zoho.auth import user_sessions
+from fastapi import APIRouter, Request
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+from routers.zoho.auth import get_logged_in_user
 from constants import response_messages as msg
 from constants import status_codes as sc
 from typing import Optional
-from utils.shared import get_user_tokens
-from fastapi import Query
-from utils.zoho_folder_helpers import get_folder_contents_json, collect_all_files_flat
+from utils.token_manager import token_manager, TokenRefreshError
+from fastapi import Query, Depends
+from utils.zoho_folder_helpers import flat_file_records, fetch_teams, fetch_team_folders
+from utils.zoho_crawler import FolderCrawler, CrawlBudget
+from utils.workdrive_index import get_workdrive_index, WorkDriveSync, index_syncs, sync_index, sync_key
+from utils.single_flight import SingleFlight
 
 
 router = APIRouter(prefix="/folders", tags=["Zoho Folders"])
-def build_folder_hierarchy(folder, headers, depth=0, max_depth=3):
-    if depth > max_depth:
-        return {"name": "Max depth reached", "files": [], "subfolders": []}
-
-    attributes = folder.get("attributes", {})
-    folder_name = attributes.get("name", "Unnamed Folder")
-    folder_id = folder.get("id")
-    folder_url = attributes.get("permalink", "")
-
-    folder_data = {
-        "name": folder_name,
-        "id": folder_id,
-        "url": folder_url,
-        "files": [],
-        "subfolders": []
-    }
-
-    # Fetch files
-    files_link = folder.get("relationships", {}).get("files", {}).get("links", {}).get("related")
-    if files_link:
-        files_res = requests.get(files_link, headers=headers)
-        if files_res.status_code == 200:
-            for file in files_res.json().get("data", []):
-                file_attrs = file.get("attributes", {})
-                if file.get("type") == "files" and file_attrs.get("name", "").endswith(".pdf"):
-                    folder_data["files"].append({
-                        "name": file_attrs.get("name", "Unnamed File"),
-                        "download_url": file_attrs.get("download_url", ""),
-                        "url": file_attrs.get("permalink", ""),
-                        "type": file.get("type")
-                    })
-
-    # Fetch subfolders recursively
-    subfolders_link = folder.get("relationships", {}).get("folders", {}).get("links", {}).get("related")
-    if subfolders_link:
-        subfolders_res = requests.get(subfolders_link, headers=headers)
-        if subfolders_res.status_code == 200:
-            for subfolder in subfolders_res.json().get("data", []):
-                subfolder_data = build_folder_hierarchy(subfolder, headers, depth + 1, max_depth)
-                folder_data["subfolders"].append(subfolder_data)
-
-    return folder_data
-
-
-def get_folder_contents_json(folder, headers, depth=0, max_depth=3):
-    if depth > max_depth:
-        return {"message": "Max recursion depth reached"}
-
-    attributes = folder.get("attributes", {})
-    folder_name = attributes.get("name", "Unnamed Folder")
-    folder_id = folder.get("id", "No ID")
-    folder_url = attributes.get("permalink", "")
-
-    folder_data = {
-        "name": folder_name,
-        "id": folder_id,
-        "url": folder_url,
-        "files": [],
-        "subfolders": []
-    }
-
-    # Fetch files
-    files_link = folder.get("relationships", {}).get("files", {}).get("links", {}).get("related")
-    if files_link:
-        files_res = requests.get(files_link, headers=headers)
-        if files_res.status_code == sc.HTTP_OK:
-            for file in files_res.json().get("data", []):
-                file_attrs = file.get("attributes", {})
-                if file.get("type") == "files":  # Double-check if it's "files" or "file"
-                    folder_data["files"].append({
-                        "name": file_attrs.get("name", "Unnamed File"),
-                        "type": file.get("type", "unknown"),
-                        "url": file_attrs.get("permalink", ""),
-                        "download_url": file_attrs.get("download_url", "")
-                    })
-        else:
-            folder_data["files"].append({"error": f"Failed to fetch files: {files_res.text}"})
-    else:
-        folder_data["files"].append({"message": "Files listing not available for this folder."})
-
-    # Fetch subfolders
-    subfolders_link = folder.get("relationships", {}).get("folders", {}).get("links", {}).get("related")
-    if subfolders_link:
-        subfolders_res = requests.get(subfolders_link, headers=headers)
-        if subfolders_res.status_code == sc.HTTP_OK:
-            for subfolder in subfolders_res.json().get("data", []):
-                subfolder_data = get_folder_contents_json(subfolder, headers, depth + 1, max_depth)
-                folder_data["subfolders"].append(subfolder_data)
-        else:
-            folder_data["subfolders"].append({"error": f"Failed to fetch subfolders: {subfolders_res.text}"})
-    else:
-        folder_data["subfolders"].append({"message": "Subfolders listing not available for this folder."})
-
-    return folder_data
 
+# Identical listings requested concurrently (same user, endpoint and params) share one result
+folder_listings = SingleFlight()
 
-@router.get("/zoho-my-folder-and-files", response_class=JSONResponse)
-async def my_folders():
-    user = user_sessions.get("current_user")
-    if not user:
-        return JSONResponse({"error": msg.NOT_LOGGED_IN}, status_code=sc.HTTP_UNAUTHORIZED)
 
-    headers = {"Authorization": f"Zoho-oauthtoken {user['access_token']}"}
-    user_url = f"{Config.ZOHO_API_URL}/workdrive/api/v1/users/me"
+def crawl_budget(
+    max_seconds: Optional[float] = Query(None, gt=0),
+    max_api_calls: Optional[int] = Query(None, gt=0),
+    max_nodes: Optional[int] = Query(None, gt=0)
+):
+    """
+    Optional per-request crawl budget; None when no limit was given.
+    """
+    if max_seconds is None and max_api_calls is None and max_nodes is None:
+        return None
+    return CrawlBudget(max_seconds, max_api_calls, max_nodes)
 
-    res = requests.get(user_url, headers=headers)
-    if res.status_code != sc.HTTP_OK:
-        return JSONResponse({"error": f"{msg.FETCH_USER_FAILED}: {res.text}"}, status_code=sc.HTTP_BAD_REQUEST)
 
-    user_id = res.json().get("data", {}).get("id")
-    if not user_id:
-        return JSONResponse({"error": "Failed to retrieve user ID"}, status_code=sc.HTTP_BAD_REQUEST)
+def budget_key(budget):
+    if budget is None:
+        return None
+    return (budget.max_seconds, budget.max_api_calls, budget.max_nodes)
 
-    incoming_link = res.json().get("data", {}).get("relationships", {}).get("incomingfolders", {}).get("links", {}).get("related")
-    if not incoming_link:
-        return JSONResponse({"error": msg.NO_ROOT_FOLDER}, status_code=sc.HTTP_BAD_REQUEST)
 
-    folders_res = requests.get(incoming_link, headers=headers)
-    if folders_res.status_code != sc.HTTP_OK:
-        return JSONResponse({"error": f"{msg.FOLDERS_FETCH_FAILED}: {folders_res.text}"}, status_code=sc.HTTP_BAD_REQUEST)
+def continuation_headers(summary):
+    """
+    A budget-limited sync that stopped early is reported in headers, so the body keeps its shape.
+    Call again with `cursor=<X-Crawl-Cursor>` to continue it.
+    """
+    if summary is None or summary["complete"]:
+        return {}
+    return {"X-Crawl-Complete": "false", "X-Crawl-Cursor": summary["cursor"]}
 
-    structured_tree = []
 
-    for folder in folders_res.json().get("data", []):
-        print("✅ Folder fetched:", folder.get("attributes", {}).get("name"))
-        tree = build_folder_hierarchy(folder, headers)
-        print("✅ Tree built:", tree["name"])
-        structured_tree.append(tree)
+@router.get("/zoho-my-folder-and-files", response_class=JSONResponse)
+async def my_folders(
+    request: Request,
+    refresh: bool = Query(False),
+    full: bool = Query(False),
+    cursor: Optional[str] = Query(None),
+    budget: Optional[CrawlBudget] = Depends(crawl_budget)
+):
+    user = await get_logged_in_user(request)
+    if not user:
+        return JSONResponse({"error": msg.NOT_LOGGED_IN}, status_code=sc.HTTP_UNAUTHORIZED)
 
-    return JSONResponse(structured_tree, status_code=sc.HTTP_OK)
+    headers = {"Authorization": f"Zoho-oauthtoken {user['access_token']}"}
+
+    # Answer from the local metadata index; only sync with Zoho when it is stale
+    index = get_workdrive_index(user["sub"])
+
+    async def build_trees():
+        summary = None
+        if cursor or refresh or await asyncio.to_thread(index.is_stale):
+            summary = await sync_index(index, headers, full=full, budget=budget, cursor=cursor)
+            if summary["complete"] and not await asyncio.to_thread(index.has_synced):
+                return {"error": "; ".join(summary["errors"])}, summary
+        # Folders the sync has not reached yet come back marked `pending`
+        return await asyncio.to_thread(index.folder_trees, "incoming", 3, True), summary
+
+    try:
+        structured_tree, summary = await folder_listings.do(
+            (user["sub"], "zoho-my-folder-and-files", refresh, full, cursor, budget_key(budget)), build_trees
+        )
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=sc.HTTP_BAD_REQUEST)
+    if isinstance(structured_tree, dict):
+        return JSONResponse(structured_tree, status_code=sc.HTTP_BAD_REQUEST)
+    print(f"✅ Trees built for {len(structured_tree)} folder(s)")
+
+    return JSONResponse(structured_tree, status_code=sc.HTTP_OK, headers=continuation_headers(summary))
 
 
 @router.get("/my-teams-folder-and-files", response_class=HTMLResponse)
-async def team_folders():
-    user = user_sessions.get("current_user")
+async def team_folders(request: Request):
+    user = await get_logged_in_user(request)
     if not user:
         return HTMLResponse(msg.NOT_LOGGED_IN, status_code=sc.HTTP_UNAUTHORIZED)
 
     headers = {"Authorization": f"Zoho-oauthtoken {user['access_token']}"}
-    teams_url = f"{Config.ZOHO_API_URL}/workdrive/api/v1/users/me/teams"
+    crawler = FolderCrawler(headers, user_id=user["sub"])
 
-    res = requests.get(teams_url, headers=headers)
-    if res.status_code != sc.HTTP_OK:
-        return HTMLResponse(f"{msg.FOLDERS_FETCH_FAILED}: {res.text}", status_code=sc.HTTP_BAD_REQUEST)
+    teams, error = await fetch_teams(crawler)
+    if error is not None:
+        return HTMLResponse(f"{msg.FOLDERS_FETCH_FAILED}: {error}", status_code=sc.HTTP_BAD_REQUEST)
 
-    output = "<h3>Team Folders & Files:</h3>"
-    for team in res.json().get("data", []):
-        team_id = team.get("id")
-        team_name = team.get("attributes", {}).get("name", "Unnamed Team")
-        if not team_id:
-            continue
+    # All teams are fetched concurrently
+    results = await asyncio.gather(*(fetch_team_folders(crawler, team) for team in teams))
 
-        output += f"<h4>Team: {team_name}</h4><ul>"
-        folders_url = f"{Config.ZOHO_API_URL}/workdrive/api/v1/teamfolders?org_id={team_id}"
-        folders_res = requests.get(folders_url, headers=headers)
+    output = ["<h3>Team Folders & Files:</h3>"]
+    for team in results:
+        team_name = team["team_name"]
+        output.append(f"<h4>Team: {team_name}</h4><ul>")
 
-        if folders_res.status_code != sc.HTTP_OK:
-            output += f"<li>{msg.FOLDERS_FETCH_FAILED} for {team_name}: {folders_res.text}</li>"
+        if team["error"] is not None:
+            output.append(f"<li>{msg.FOLDERS_FETCH_FAILED} for {team_name}: {team['error']}</li></ul>")
             continue
 
-        for folder in folders_res.json().get("data", []):
-            folder_name = folder.get("attributes", {}).get("name", "Unnamed Folder")
-            folder_id = folder.get("id", "No ID")
-            output += f"<li>{folder_name} (ID: {folder_id})</li>"
+        for folder in team["folders"]:
+            output.append(f"<li>{folder['name']} (ID: {folder['id']})</li>")
+
+        output.append("</ul>")
 
-        output += "</ul>"
+    output.append("<a href='/'>Back</a>")
+    return HTMLResponse("".join(output), status_code=sc.HTTP_OK)
 
-    output += "<a href='/'>Back</a>"
-    return HTMLResponse(output, status_code=sc.HTTP_OK)
+
+@router.get("/my-teams-folder-and-files-json", response_class=JSONResponse)
+async def team_folders_json(
+    request: Request,
+    stream: bool = Query(False),
+    include_contents: bool = Query(False),
+    max_depth: Optional[int] = Query(None, ge=0),
+    budget: Optional[CrawlBudget] = Depends(crawl_budget)
+):
+    user = await get_logged_in_user(request)
+    if not user:
+        return JSONResponse({"error": msg.NOT_LOGGED_IN}, status_code=sc.HTTP_UNAUTHORIZED)
+
+    headers = {"Authorization": f"Zoho-oauthtoken {user['access_token']}"}
+    # Team trees are crawled live: when the budget runs out, unvisited folders are returned as `pending`
+    crawler = FolderCrawler(headers, max_depth=max_depth, user_id=user["sub"], budget=budget)
+
+    teams, error = await fetch_teams(crawler)
+    if error is not None:
+        return JSONResponse({"error": f"{msg.FOLDERS_FETCH_FAILED}: {error}"}, status_code=sc.HTTP_BAD_REQUEST)
+
+    tasks = [asyncio.ensure_future(fetch_team_folders(crawler, team, include_contents)) for team in teams]
+
+    if stream:
+        # NDJSON: one team per line, in the order teams finish
+        async def ndjson_teams():
+            try:
+                for next_team in asyncio.as_completed(tasks):
+                    yield json.dumps(await next_team) + "\n"
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+        return StreamingResponse(ndjson_teams(), media_type="application/x-ndjson")
+
+    results = list(await asyncio.gather(*tasks))
+    headers = {"X-Crawl-Complete": "false"} if crawler.frontier else {}
+    return JSONResponse(results, status_code=sc.HTTP_OK, headers=headers)
 
 @router.get("/my-folder-and-files-n8n", response_class=JSONResponse)
-async def my_folders_n8n(user_id: str = Query(...)):
+async def my_folders_n8n(
+    user_id: str = Query(...),
+    stream: bool = Query(False),
+    refresh: bool = Query(False),
+    full: bool = Query(False),
+    cursor: Optional[str] = Query(None),
+    budget: Optional[CrawlBudget] = Depends(crawl_budget)
+):
 
     print("im in myfolder n8n")
-    tokens = get_user_tokens(user_id)
-    if not tokens or not tokens.get("access_token"):
+    try:
+        access_token = await token_manager.aget_access_token(user_id)
+    except TokenRefreshError:
         return JSONResponse({"error": "User not logged in or token missing"}, status_code=sc.HTTP_UNAUTHORIZED)
 
-    access_token = tokens["access_token"]
     headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
 
-    flat_files_result = []
-
-    # 1. Fetch incoming folders
-    user_url = f"{Config.ZOHO_API_URL}/workdrive/api/v1/users/me"
-    res = requests.get(user_url, headers=headers)
-    if res.status_code == sc.HTTP_OK:
-        incoming_link = (
-            res.json()
-            .get("data", {})
-            .get("relationships", {})
-            .get("incomingfolders", {})
-            .get("links", {})
-            .get("related")
+    index = get_workdrive_index(user_id)
+    summary = None
+
+    if stream and budget is None and cursor is None and not await asyncio.to_thread(index.has_synced):
+        # Cold index: stream records straight from the first sync as folders are listed.
+        # If the same sync is already running for this user, wait for it and read the index;
+        # a different one (e.g. budget-limited) runs first and this sync queues behind it.
+        sync = WorkDriveSync(index, headers, full=full)
+        feed = sync.subscribe()
+        task, started = index_syncs.start(sync_key(user_id, full), sync.run)
+
+        if started:
+            async def ndjson_from_sync():
+                while (visit := await feed.get()) is not None:
+                    for record in flat_file_records(visit):
+                        record["source"] = visit["context"]["source"]
+                        yield json.dumps(record) + "\n"
+
+            return StreamingResponse(ndjson_from_sync(), media_type="application/x-ndjson")
+
+        await asyncio.shield(task)
+
+    elif cursor or refresh or await asyncio.to_thread(index.is_stale):
+        try:
+            summary = await sync_index(index, headers, full=full, budget=budget, cursor=cursor)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=sc.HTTP_BAD_REQUEST)
+
+    if stream:
+        # NDJSON: one file record per line, read lazily from the index
+        def ndjson_lines():
+            for record in index.iter_flat_files():
+                yield json.dumps(record) + "\n"
+
+        return StreamingResponse(
+            ndjson_lines(), media_type="application/x-ndjson", headers=continuation_headers(summary)
         )
 
-        if incoming_link:
-            res2 = requests.get(incoming_link, headers=headers)
-            if res2.status_code == sc.HTTP_OK:
-                for folder in res2.json().get("data", []):
-                    folder_name = folder.get("attributes", {}).get("name", "Unnamed Folder")
-                    files = collect_all_files_flat(folder, headers, parent_folder_name=folder_name)
-                    for f in files:
-                        f["source"] = "incoming"
-                    flat_files_result.extend(files)
-
-    # 2. Fetch myfolders
-    myfolders_url = f"{Config.ZOHO_API_URL}/workdrive/api/v1/myfolders"
-    res3 = requests.get(myfolders_url, headers=headers)
-    if res3.status_code == sc.HTTP_OK:
-        for folder in res3.json().get("data", []):
-            folder_name = folder.get("attributes", {}).get("name", "Unnamed Folder")
-            files = collect_all_files_flat(folder, headers, parent_folder_name=folder_name)
-            for f in files:
-                f["source"] = "myfolder"
-            flat_files_result.extend(files)
-
- 
-        
-    return JSONResponse(flat_files_result, status_code=sc.HTTP_OK)
-
-
+    flat_files_result = await folder_listings.do(
+        (user_id, "my-folder-and-files-n8n", refresh, full),
+        lambda: asyncio.to_thread(lambda: list(index.iter_flat_files()))
+    )
 
+    return JSONResponse(flat_files_result, status_code=sc.HTTP_OK, headers=continuation_headers(summary))
@@ -1,28 +1,28 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Request
 from fastapi.responses import JSONResponse
-import requests
+import httpx
 from config import Config
-from routers.zoho.auth import user_sessions
+from routers.zoho.auth import get_logged_in_user
 from constants import response_messages as msg
 from constants import status_codes as sc
-from utils.shared import get_user_tokens
+from utils.token_manager import token_manager, TokenRefreshError
+from utils.zoho_client import zoho_client
 
 
 router = APIRouter(prefix="/api/zoho/org", tags=["Zoho Organization"])
 
 
 @router.get("/basic")
-async def get_basic_org_info():
+async def get_basic_org_info(request: Request):
     """
     Fetches basic org_id and org_name using WorkDrive 'users/me' API.
     """
-    user = user_sessions.get("current_user")
+    user = await get_logged_in_user(request)
     if not user:
         return JSONResponse({"error": msg.NOT_LOGGED_IN}, status_code=sc.HTTP_UNAUTHORIZED)
 
-    headers = {"Authorization": f"Zoho-oauthtoken {user['access_token']}"}
     url = f"{Config.ZOHO_API_URL}/workdrive/api/v1/users/me"
-    res = requests.get(url, headers=headers)
+    res = await zoho_client.aget(url, access_token=user["access_token"], user_id=user["sub"])
 
     if res.status_code != sc.HTTP_OK:
         return JSONResponse({"error": f"{msg.FETCH_USER_FAILED}: {res.text}"}, status_code=sc.HTTP_BAD_REQUEST)
@@ -57,16 +57,16 @@ async def get_basic_org_info():
 #     return JSONResponse(res.json(), status_code=sc.HTTP_OK)
 
 @router.get("/details")
-async def get_org_details():
-    user = user_sessions.get("current_user")
+async def get_org_details(request: Request):
+    user = await get_logged_in_user(request)
     if not user:
         return JSONResponse({"error": "User not authenticated"}, status_code=401)
 
-    access_token = user['access_token']
-    headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
-
     try:
-        res = requests.get("https://www.zohoapis.com/directory/v1/organizations", headers=headers)
+        res = await zoho_client.aget(
+            "https://www.zohoapis.com/directory/v1/organizations",
+            access_token=user["access_token"], user_id=user["sub"]
+        )
         if res.status_code == 200:
             return JSONResponse(res.json())
         else:
@@ -76,20 +76,21 @@ async def get_org_details():
     
 @router.get("/{org_id}/users")
 async def get_org_users(org_id: str, user_id: str = Query(...)):
-    tokens = await get_user_tokens(user_id)
-    access_token = tokens.get("access_token")
+    try:
+        access_token = await token_manager.aget_access_token(user_id)
+    except TokenRefreshError as e:
+        return JSONResponse({"error": str(e)}, status_code=e.status_code)
 
     url = f"https://directory.zoho.com/api/v1/orgs/{org_id}/users"
-    headers = {
-        "Authorization": f"Zoho-oauthtoken {access_token}",
-        "Content-Type": "application/json"
-    }
+    headers = {"Content-Type": "application/json"}
 
     try:
-        response = requests.get(url, headers=headers)
+        response = await zoho_client.aget(
+            url, access_token=access_token, headers=headers, user_id=user_id, org_id=org_id
+        )
         response.raise_for_status()
         return response.json()
-    except requests.exceptions.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         return JSONResponse(
             status_code=response.status_code,
             content={"error": f"HTTP error: {response.text}"}
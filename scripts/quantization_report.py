@@ -0,0 +1,38 @@
+# scripts/quantization_report.py
+#
+# Memory per vector and recall@k of each local-index quantization mode, measured on a
+# collection already ingested with VECTOR_BACKEND=local:
+#
+#   python scripts/quantization_report.py [collection] [k] [queries]
+import json
+import os
+import sys
+
+# Add the project root to sys.path so absolute imports work
+sys.path.append(os.path.abspath("."))
+
+import numpy as np
+from config import Config
+from routers.chatbot.app.db.quantization import quantization_report
+
+collection = sys.argv[1] if len(sys.argv) > 1 else Config.ASTRA_COLLECTION
+k = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+query_count = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+directory = os.path.join(Config.LOCAL_VECTOR_DIR, collection)
+with open(os.path.join(directory, "state.json")) as f:
+    state = json.load(f)
+vectors = np.memmap(os.path.join(directory, "vectors.f32"), dtype=np.float32, mode="r").reshape(-1, state["dim"])
+vectors = np.asarray(vectors[:state["count"]])
+
+# Held-out rows act as queries, so no query is its own nearest neighbour
+rng = np.random.default_rng(0)
+held_out = np.zeros(len(vectors), dtype=bool)
+held_out[rng.choice(len(vectors), min(query_count, len(vectors) // 10), replace=False)] = True
+corpus, queries = vectors[~held_out], vectors[held_out]
+
+print(f"📊 {collection}: {len(corpus)} vectors x {state['dim']} dims, {len(queries)} queries, recall@{k}, "
+      f"rerank of top {k * Config.LOCAL_VECTOR_RERANK_FACTOR}")
+for row in quantization_report(corpus, queries, k=k):
+    row["corpus_mb"] = round(row["bytes_per_vector"] * len(corpus) / 2 ** 20, 2)
+    print(row)
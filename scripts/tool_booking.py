@@ -1,6 +1,7 @@
 # scripts/test_booking.py
 import sys
 import os
+import asyncio
 
 # Add the project root to sys.path so absolute imports work
 sys.path.append(os.path.abspath("."))
@@ -17,5 +18,5 @@ BOOK_MEETING {
 '''
 
 user_id = "your-user-id"  # 🔁 Replace with actual test user_id
-result = wrapped_booking_tool(prompt, user_id)
+result = asyncio.run(wrapped_booking_tool(prompt, user_id))
 print(result)
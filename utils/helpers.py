@@ -0,0 +1,48 @@
+import base64
+import hashlib
+import hmac
+import json
+from config import Config
+
+
+def _sign(body: bytes) -> str:
+    digest = hmac.new(Config.SECRET_KEY.encode(), body, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def sign_value(value: str) -> str:
+    """
+    `value` + "." + HMAC signature, e.g. for session cookies.
+    """
+    return f"{value}.{_sign(value.encode())}"
+
+
+def unsign_value(signed: str):
+    """
+    Returns the original value, or None when the signature does not match.
+    """
+    if not signed or "." not in signed:
+        return None
+    value, signature = signed.rsplit(".", 1)
+    return value if hmac.compare_digest(signature, _sign(value.encode())) else None
+
+
+def encode_cursor(payload: dict) -> str:
+    """
+    Opaque, tamper-proof continuation cursor: base64url(JSON) + "." + HMAC signature.
+    """
+    body = base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).rstrip(b"=")
+    return f"{body.decode()}.{_sign(body)}"
+
+
+def decode_cursor(cursor: str):
+    """
+    Returns the cursor payload, or None when the cursor is malformed or its signature does not match.
+    """
+    try:
+        body, signature = cursor.split(".", 1)
+        if not hmac.compare_digest(signature, _sign(body.encode())):
+            return None
+        return json.loads(base64.urlsafe_b64decode(body + "=" * (-len(body) % 4)))
+    except (ValueError, TypeError):
+        return None
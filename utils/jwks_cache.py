@@ -0,0 +1,106 @@
+# utils/jwks_cache.py
+
+import asyncio
+import time
+import httpx
+from jose import jwk, jwt, JWTError
+from jose.exceptions import JWKError
+from config import Config
+from constants import status_codes as sc
+from utils.single_flight import SingleFlight
+from utils.zoho_client import zoho_client
+
+
+class JWKSCache:
+    """
+    Zoho's id_token signing keys, kept in memory.
+
+    Keys are fetched once and refreshed in the background every JWKS_CACHE_TTL / 2
+    seconds, so verifying a login is local CPU work only. An unknown `kid` (key
+    rotation) triggers one refetch, at most every JWKS_MIN_REFETCH_INTERVAL seconds.
+    The URL comes from ZOHO_JWKS_URL, so tests can point it at a local stand-in.
+    """
+
+    def __init__(self, url: str = None, ttl: float = None):
+        self.url = url or Config.ZOHO_JWKS_URL
+        self.ttl = Config.JWKS_CACHE_TTL if ttl is None else ttl
+        self.keys = {}
+        self.fetched_at = 0.0
+        self._fetches = SingleFlight()
+        self._task = None
+
+    def is_expired(self) -> bool:
+        return time.monotonic() - self.fetched_at > self.ttl
+
+    async def _fetch(self):
+        try:
+            res = await zoho_client.aget(self.url)
+        except httpx.HTTPError as e:
+            raise JWTError(f"JWKS fetch failed: {e}")
+        if res.status_code != sc.HTTP_OK:
+            raise JWTError(f"JWKS fetch failed ({res.status_code})")
+
+        try:
+            keys = {}
+            for key in res.json()["keys"]:
+                # Constructed once here, so verification does not re-parse the JWK
+                keys[key.get("kid")] = jwk.construct(key, key.get("alg", "RS256"))
+        except (ValueError, KeyError, TypeError, AttributeError, JWKError) as e:
+            # A malformed key set fails the login like a fetch error; the previous keys stay in use
+            raise JWTError(f"JWKS response invalid: {e!r}")
+        self.keys = keys
+        self.fetched_at = time.monotonic()
+        print(f"🔐 Loaded {len(keys)} Zoho signing key(s)")
+
+    async def refresh(self):
+        await self._fetches.do("jwks", self._fetch)
+
+    async def get_key(self, kid: str):
+        if not self.keys or self.is_expired():
+            await self.refresh()
+        elif kid not in self.keys and time.monotonic() - self.fetched_at > Config.JWKS_MIN_REFETCH_INTERVAL:
+            await self.refresh()
+        return self.keys.get(kid)
+
+    async def verify_id_token(self, id_token: str, access_token: str = None) -> dict:
+        """
+        Verified id_token claims (signature, exp, aud, iss and at_hash). Raises JWTError.
+        """
+        header = jwt.get_unverified_header(id_token)
+        key = await self.get_key(header.get("kid"))
+        if key is None:
+            raise JWTError("Unknown signing key")
+        return jwt.decode(
+            id_token,
+            key,
+            algorithms=[header.get("alg", "RS256")],
+            audience=Config.CLIENT_ID,
+            issuer=Config.ZOHO_ID_TOKEN_ISSUER,
+            access_token=access_token,
+        )
+
+    async def run(self):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ JWKS refresh failed: {e}")
+            await asyncio.sleep(self.ttl / 2)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+jwks_cache = JWKSCache()
@@ -0,0 +1,125 @@
+# utils/session_store.py
+
+import secrets
+from datetime import datetime, timedelta, timezone
+from config import Config
+from utils.helpers import sign_value, unsign_value
+from utils.lru_cache import LRUCache
+from utils.shared import mongo
+
+
+class MemorySessionBackend:
+    """
+    In-process backend for tests and single-worker development.
+    """
+
+    def __init__(self):
+        self._sessions = {}
+
+    async def get(self, session_id: str):
+        session = self._sessions.get(session_id)
+        if session is None or session["expires_at"] <= datetime.now(timezone.utc):
+            return None
+        return session["user"]
+
+    async def set(self, session_id: str, user: dict, expires_at: datetime):
+        self._sessions[session_id] = {"user": user, "expires_at": expires_at}
+
+    async def delete(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    async def ensure_indexes(self):
+        pass
+
+
+class MongoSessionBackend:
+    """
+    Sessions shared by every worker and node; Mongo's TTL index removes expired ones.
+    """
+
+    def __init__(self, collection=None):
+        self._collection = collection
+
+    @property
+    def collection(self):
+        return self._collection if self._collection is not None else mongo.sessions
+
+    async def get(self, session_id: str):
+        session = await self.collection.find_one(
+            {"_id": session_id, "expires_at": {"$gt": datetime.now(timezone.utc)}}, {"user": 1}
+        )
+        return session["user"] if session else None
+
+    async def set(self, session_id: str, user: dict, expires_at: datetime):
+        await self.collection.replace_one(
+            {"_id": session_id}, {"_id": session_id, "user": user, "expires_at": expires_at}, upsert=True
+        )
+
+    async def delete(self, session_id: str):
+        await self.collection.delete_one({"_id": session_id})
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+
+class SessionStore:
+    """
+    Per-browser login sessions.
+
+    The browser holds a signed, random session id cookie; the session (user identity
+    only, tokens stay with the token manager) lives in a shared backend so any worker
+    can serve any request. A small LRU keeps hot sessions off the database; entries
+    live SESSION_CACHE_TTL seconds, which bounds how long a logout on another worker
+    can go unnoticed here.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or (
+            MemorySessionBackend() if Config.SESSION_BACKEND == "memory" else MongoSessionBackend()
+        )
+        self.cache = LRUCache(maxsize=Config.SESSION_CACHE_SIZE, ttl=Config.SESSION_CACHE_TTL)
+
+    async def create(self, user: dict) -> str:
+        session_id = secrets.token_urlsafe(32)
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=Config.SESSION_TTL)
+        await self.backend.set(session_id, user, expires_at)
+        self.cache.set(session_id, user)
+        return session_id
+
+    async def get(self, session_id: str):
+        if not session_id:
+            return None
+        user = self.cache.get(session_id)
+        if user is None:
+            user = await self.backend.get(session_id)
+            if user is not None:
+                self.cache.set(session_id, user)
+        return user
+
+    async def delete(self, session_id: str):
+        self.cache.pop(session_id)
+        await self.backend.delete(session_id)
+
+    # ---------- Cookies ----------
+
+    @staticmethod
+    def session_id_from_request(request):
+        return unsign_value(request.cookies.get(Config.SESSION_COOKIE_NAME))
+
+    @staticmethod
+    def set_cookie(response, session_id: str):
+        response.set_cookie(
+            Config.SESSION_COOKIE_NAME,
+            sign_value(session_id),
+            max_age=Config.SESSION_TTL,
+            httponly=True,
+            samesite="lax",
+            secure=Config.SESSION_COOKIE_SECURE,
+        )
+
+    @staticmethod
+    def clear_cookie(response):
+        response.delete_cookie(Config.SESSION_COOKIE_NAME)
+
+
+session_store = SessionStore()
@@ -1,35 +1,261 @@
+import asyncio
 import os
-from pymongo import MongoClient
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pymongo import AsyncMongoClient
 from dotenv import load_dotenv
+from config import Config
+from utils.lru_cache import LRUCache
 
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI")
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "zoho_auth")
 
-client = MongoClient(MONGO_URI)
-db = client[MONGO_DB_NAME]
 
-users_collection = db["users"]
-chatlogs_collection = db["chat_logs"]
+class Mongo:
+    """
+    Async MongoDB access (PyMongo's native asyncio client) shared by the whole app.
 
+    The client and its connection pool are created in the FastAPI lifespan
+    (`connect` / `close`); collections are looked up at call time, so modules can
+    import this before the client exists.
+    """
 
-def save_user_tokens(user_id, email, name, access_token, refresh_token):
-    users_collection.update_one(
+    def __init__(self):
+        self.client = None
+
+    def connect(self) -> AsyncMongoClient:
+        if self.client is None:
+            self.client = AsyncMongoClient(
+                MONGO_URI,
+                maxPoolSize=Config.MONGO_MAX_POOL_SIZE,
+                minPoolSize=Config.MONGO_MIN_POOL_SIZE,
+                maxIdleTimeMS=Config.MONGO_MAX_IDLE_TIME_MS,
+                waitQueueTimeoutMS=Config.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+                serverSelectionTimeoutMS=Config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            )
+        return self.client
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    @property
+    def db(self):
+        return self.connect()[MONGO_DB_NAME]
+
+    @property
+    def users(self):
+        return self.db["users"]
+
+    @property
+    def user_invalidations(self):
+        return self.db["user_invalidations"]
+
+    @property
+    def chat_logs(self):
+        return self.db["chat_logs"]
+
+    @property
+    def chat_summaries(self):
+        return self.db["chat_summaries"]
+
+    @property
+    def sessions(self):
+        return self.db["sessions"]
+
+
+mongo = Mongo()
+
+
+class UserCache:
+    """
+    Read-through cache of user records (tokens, calendars) in front of `users`.
+
+    Writes through this module invalidate the local entry immediately and append an
+    event to `user_invalidations`; every worker polls that feed each
+    USER_CACHE_SYNC_INTERVAL seconds and drops the users changed elsewhere.
+    USER_CACHE_TTL bounds staleness if the feed is unavailable. Other in-process
+    caches of user data subscribe with `add_listener`; caches of other per-user data
+    (e.g. conversations) send and receive their own `kind` of event on the same feed.
+    """
+
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex
+        self.cache = LRUCache(maxsize=Config.USER_CACHE_SIZE, ttl=Config.USER_CACHE_TTL)
+        self._listeners = {}
+        self._since = None
+        self._task = None
+
+    def add_listener(self, callback, kind: str = "user"):
+        """
+        `callback(user_id)` is called whenever a user's record changes, here or on another
+        worker; with another `kind`, when another worker publishes an event of that kind.
+        """
+        self._listeners.setdefault(kind, []).append(callback)
+
+    def _drop(self, user_id, kind: str = "user"):
+        if kind == "user":
+            self.cache.pop(user_id)
+        for callback in self._listeners.get(kind, []):
+            callback(user_id)
+
+    async def get(self, user_id):
+        record = self.cache.get(user_id)
+        if record is None:
+            record = await mongo.users.find_one({"zoho_id": user_id})
+            if record is not None:
+                self.cache.set(user_id, record)
+        return record
+
+    async def invalidate(self, user_id):
+        self.cache.pop(user_id)
+        await self.publish([user_id])
+
+    async def publish(self, user_ids: list, kind: str = "user"):
+        """
+        Tells the other workers that these users' `kind` data changed.
+        """
+        now = datetime.now(timezone.utc)
+        try:
+            await mongo.user_invalidations.insert_many(
+                [{"user_id": user_id, "kind": kind, "origin": self.worker_id, "at": now} for user_id in user_ids]
+            )
+        except Exception as e:
+            print(f"⚠️ Could not publish {kind} cache invalidation for {', '.join(user_ids)}: {e}")
+
+    async def sync(self) -> int:
+        """
+        Drops users changed by other workers since the last poll. Returns how many events.
+        """
+        now = datetime.now(timezone.utc)
+        since = (self._since or now) - timedelta(seconds=Config.USER_CACHE_SYNC_OVERLAP)
+        cursor = mongo.user_invalidations.find(
+            {"at": {"$gte": since}, "origin": {"$ne": self.worker_id}},
+            {"_id": 0, "user_id": 1, "kind": 1}
+        )
+        events = {(doc["user_id"], doc.get("kind", "user")) async for doc in cursor}
+        for user_id, kind in events:
+            self._drop(user_id, kind)
+        self._since = now
+        return len(events)
+
+    async def run(self):
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ User cache sync error: {e}")
+            await asyncio.sleep(Config.USER_CACHE_SYNC_INTERVAL)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+user_cache = UserCache()
+
+
+async def ensure_user_indexes():
+    """
+    One user document per Zoho id, the index the token refresher scans,
+    and expiry of old cache invalidation events.
+    """
+    await mongo.users.create_index("zoho_id", unique=True)
+    await mongo.users.create_index([("last_active_at", 1), ("expires_at", 1)])
+    await mongo.user_invalidations.create_index("at", expireAfterSeconds=Config.USER_INVALIDATION_RETENTION)
+
+
+async def save_user_tokens(user_id, email, name, access_token, refresh_token, expires_in=None):
+    await mongo.users.update_one(
         {"zoho_id": user_id},
         {
             "$set": {
                 "email": email,
                 "name": name,
                 "access_token": access_token,
-                "refresh_token": refresh_token
+                "refresh_token": refresh_token,
+                "expires_in": expires_in,
+                # Absolute expiry (epoch seconds); None means unknown and is treated as expired
+                "expires_at": time.time() + float(expires_in) if expires_in else None
             }
         },
         upsert=True
     )
+    await user_cache.invalidate(user_id)
 
-def get_user_tokens(user_id):
-    return users_collection.find_one({"zoho_id": user_id})
+async def get_user_tokens(user_id):
+    return await user_cache.get(user_id)
 
-def delete_user_tokens(user_id):
-    return users_collection.delete_one({"zoho_id": user_id})
+async def delete_user_tokens(user_id):
+    result = await mongo.users.delete_one({"zoho_id": user_id})
+    await user_cache.invalidate(user_id)
+    return result
+
+async def save_user_calendars(user_id, calendar_id, calendars):
+    await mongo.users.update_one(
+        {"zoho_id": user_id},
+        {"$set": {"calendar_id": calendar_id, "calendars": calendars}}
+    )
+    await user_cache.invalidate(user_id)
+
+async def clear_user_calendars(user_id):
+    await mongo.users.update_one(
+        {"zoho_id": user_id},
+        {"$unset": {"calendar_id": "", "calendars": ""}}
+    )
+    await user_cache.invalidate(user_id)
+
+async def touch_user(user_id):
+    await mongo.users.update_one({"zoho_id": user_id}, {"$set": {"last_active_at": time.time()}})
+
+async def find_users_to_refresh(active_since, expiring_before):
+    """
+    Ids of users active since `active_since` whose access token expires before `expiring_before` (or has no expiry).
+    """
+    cursor = mongo.users.find(
+        {
+            "refresh_token": {"$ne": None},
+            "last_active_at": {"$gte": active_since},
+            "$or": [{"expires_at": None}, {"expires_at": {"$lte": expiring_before}}]
+        },
+        {"zoho_id": 1}
+    )
+    return [user["zoho_id"] async for user in cursor]
+
+async def claim_token_refresh(user_id, lease_seconds):
+    """
+    Takes the user's background-refresh lease unless another worker holds an unexpired one.
+    Returns the lease expiry to release it with, or None when it is taken.
+    """
+    now = time.time()
+    until = now + lease_seconds
+    claimed = await mongo.users.find_one_and_update(
+        {
+            "zoho_id": user_id,
+            "$or": [{"refreshing_until": None}, {"refreshing_until": {"$lte": now}}]
+        },
+        {"$set": {"refreshing_until": until}},
+        {"_id": 1}
+    )
+    return until if claimed else None
+
+async def release_token_refresh(user_id, until):
+    await mongo.users.update_one(
+        {"zoho_id": user_id, "refreshing_until": until},
+        {"$set": {"refreshing_until": None}}
+    )
@@ -0,0 +1,39 @@
+# utils/single_flight.py
+
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent async work by key.
+
+    The first caller for a key starts the work as a task; callers arriving while it
+    is in flight await that same task and share its result (or exception). The task
+    is shielded, so one caller disconnecting does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+
+    def start(self, key, func):
+        """
+        Returns (task, started) — `started` is False when an in-flight task was joined.
+        `func` is a zero-argument coroutine function, only called when starting.
+        """
+        task = self._in_flight.get(key)
+        if task is not None:
+            return task, False
+
+        task = asyncio.ensure_future(func())
+        self._in_flight[key] = task
+
+        def forget(done_task):
+            if self._in_flight.get(key) is done_task:
+                del self._in_flight[key]
+
+        task.add_done_callback(forget)
+        return task, True
+
+    async def do(self, key, func):
+        task, _started = self.start(key, func)
+        return await asyncio.shield(task)
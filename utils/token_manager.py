@@ -0,0 +1,154 @@
+# utils/token_manager.py
+
+import time
+from config import Config
+from constants import response_messages as msg
+from constants import status_codes as sc
+from utils.shared import save_user_tokens, get_user_tokens, touch_user, user_cache
+from utils.single_flight import SingleFlight
+from utils.zoho_client import zoho_client
+
+
+class TokenRefreshError(Exception):
+    def __init__(self, message: str, status_code: int = sc.HTTP_BAD_REQUEST):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class TokenManager:
+    """
+    Hands out Zoho access tokens per user.
+
+    Tokens are cached in process together with their expiry and are only refreshed
+    (with the stored refresh token) once they are within ZOHO_TOKEN_REFRESH_MARGIN
+    of expiring. Concurrent callers for one user share a single refresh (SingleFlight).
+
+    User-facing lookups also record `last_active_at` (throttled), which the
+    background TokenRefresher uses to pick whose tokens to renew ahead of time.
+    """
+
+    def __init__(self):
+        self._tokens = {}
+        self._refreshes = SingleFlight()
+        self._last_touched = {}
+        user_cache.add_listener(self.invalidate)  # tokens changed (refresh, logout) on another worker
+
+    @staticmethod
+    def is_fresh(entry: dict, min_ttl: float = None) -> bool:
+        if not entry or not entry.get("access_token") or not entry.get("expires_at"):
+            return False
+        min_ttl = Config.ZOHO_TOKEN_REFRESH_MARGIN if min_ttl is None else min_ttl
+        return entry["expires_at"] - time.time() > min_ttl
+
+    async def _touch(self, user_id: str):
+        now = time.time()
+        if now - self._last_touched.get(user_id, 0) < Config.USER_ACTIVITY_WRITE_INTERVAL:
+            return
+        self._last_touched[user_id] = now
+        try:
+            await touch_user(user_id)
+        except Exception as e:
+            print(f"⚠️ Could not record activity for {user_id}: {e}")
+
+    async def _current(self, user_id: str, min_ttl: float = None) -> dict:
+        """
+        Cached entry if still fresh, otherwise the stored record (another worker may have refreshed it).
+        """
+        entry = self._tokens.get(user_id)
+        if self.is_fresh(entry, min_ttl):
+            return entry
+
+        record = await get_user_tokens(user_id)
+        if not record:
+            raise TokenRefreshError("User not found or not authorized", sc.HTTP_UNAUTHORIZED)
+        entry = {key: record.get(key) for key in ("access_token", "refresh_token", "expires_at", "email", "name")}
+        self._tokens[user_id] = entry
+        return entry
+
+    @staticmethod
+    def _refresh_request(entry: dict) -> dict:
+        if not entry.get("refresh_token"):
+            raise TokenRefreshError("No refresh token found")
+        return {
+            "url": f"{Config.ZOHO_ACCOUNTS_URL}/oauth/v2/token",
+            "data": {
+                'refresh_token': entry["refresh_token"],
+                'client_id': Config.CLIENT_ID,
+                'client_secret': Config.CLIENT_SECRET,
+                'grant_type': 'refresh_token'
+            },
+            "headers": {'Content-Type': 'application/x-www-form-urlencoded'},
+        }
+
+    async def _save_refresh(self, user_id: str, entry: dict, res) -> str:
+        if res.status_code != sc.HTTP_OK:
+            raise TokenRefreshError(f"Failed to refresh token: {res.text}")
+
+        tokens = res.json()
+        access_token = tokens.get("access_token")
+        if not access_token:
+            raise TokenRefreshError(msg.NO_ACCESS_TOKEN)
+
+        print(f"🔑 Refreshed Zoho access token for {user_id}")
+        return await self.store(
+            user_id,
+            email=entry.get("email", ""),
+            name=entry.get("name", ""),
+            access_token=access_token,
+            refresh_token=entry["refresh_token"],  # Zoho keeps the same refresh token
+            expires_in=tokens.get("expires_in")
+        )
+
+    # ---------- Public API ----------
+
+    async def store(self, user_id: str, email: str, name: str, access_token: str, refresh_token: str, expires_in=None) -> str:
+        """
+        Saves a user's tokens to Mongo and caches them. Returns the access token.
+        """
+        await save_user_tokens(
+            user_id=user_id,
+            email=email,
+            name=name,
+            access_token=access_token,
+            refresh_token=refresh_token,
+            expires_in=expires_in
+        )
+        self._tokens[user_id] = {
+            "access_token": access_token,
+            "refresh_token": refresh_token,
+            "expires_at": time.time() + float(expires_in) if expires_in else None,
+            "email": email,
+            "name": name,
+        }
+        return access_token
+
+    def invalidate(self, user_id: str):
+        self._tokens.pop(user_id, None)
+
+    async def aget_access_token(self, user_id: str) -> str:
+        """
+        A valid access token for the user, refreshing it only near expiry. Raises TokenRefreshError.
+        """
+        await self._touch(user_id)
+        return await self._aget(user_id)
+
+    async def prefetch(self, user_id: str) -> str:
+        """
+        Background renewal: refreshes tokens within ZOHO_TOKEN_PREFETCH_LEAD of expiry,
+        without counting as user activity.
+        """
+        return await self._aget(user_id, Config.ZOHO_TOKEN_PREFETCH_LEAD)
+
+    async def _aget(self, user_id: str, min_ttl: float = None) -> str:
+        entry = await self._current(user_id, min_ttl)
+        if self.is_fresh(entry, min_ttl):
+            return entry["access_token"]
+
+        async def refresh():
+            res = await zoho_client.apost(**self._refresh_request(entry), user_id=user_id)
+            return await self._save_refresh(user_id, entry, res)
+
+        return await self._refreshes.do(user_id, refresh)
+
+
+token_manager = TokenManager()
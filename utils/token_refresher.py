@@ -0,0 +1,84 @@
+# utils/token_refresher.py
+
+import asyncio
+import time
+from config import Config
+from utils.shared import find_users_to_refresh, claim_token_refresh, release_token_refresh
+from utils.token_manager import token_manager
+
+
+class TokenRefresher:
+    """
+    Background task that renews access tokens of recently active users shortly
+    before they expire, so user-facing requests rarely wait on oauth/v2/token.
+
+    Every TOKEN_REFRESHER_INTERVAL seconds it looks up users active within
+    TOKEN_REFRESHER_ACTIVE_WITHIN whose token expires within ZOHO_TOKEN_PREFETCH_LEAD,
+    and refreshes them in batches with at most TOKEN_REFRESHER_CONCURRENCY in flight.
+    Each refresh holds a Mongo lease (`refreshing_until`, TOKEN_REFRESHER_LEASE seconds),
+    so workers scanning at the same time do not refresh the same user; users another
+    worker already refreshed are skipped, since prefetch re-reads the stored record.
+    A failure for one user is logged and does not affect the rest of the batch.
+    """
+
+    def __init__(self, manager=token_manager):
+        self.manager = manager
+        self._task = None
+
+    async def run_once(self) -> dict:
+        now = time.time()
+        user_ids = await find_users_to_refresh(
+            now - Config.TOKEN_REFRESHER_ACTIVE_WITHIN,
+            now + Config.ZOHO_TOKEN_PREFETCH_LEAD,
+        )
+
+        semaphore = asyncio.Semaphore(Config.TOKEN_REFRESHER_CONCURRENCY)
+        stats = {"checked": len(user_ids), "leased_elsewhere": 0, "failed": 0}
+
+        async def refresh(user_id):
+            async with semaphore:
+                try:
+                    lease = await claim_token_refresh(user_id, Config.TOKEN_REFRESHER_LEASE)
+                    if lease is None:
+                        stats["leased_elsewhere"] += 1
+                        return
+                    try:
+                        await self.manager.prefetch(user_id)
+                    finally:
+                        await release_token_refresh(user_id, lease)
+                except Exception as e:
+                    stats["failed"] += 1
+                    print(f"⚠️ Background token refresh failed for {user_id}: {e}")
+
+        batch_size = Config.TOKEN_REFRESHER_BATCH_SIZE
+        for start in range(0, len(user_ids), batch_size):
+            await asyncio.gather(*(refresh(user_id) for user_id in user_ids[start:start + batch_size]))
+        return stats
+
+    async def run(self):
+        while True:
+            try:
+                stats = await self.run_once()
+                if stats["checked"]:
+                    print(f"🔄 Token refresher: {stats}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Token refresher error: {e}")
+            await asyncio.sleep(Config.TOKEN_REFRESHER_INTERVAL)
+
+    def start(self):
+        if Config.TOKEN_REFRESHER_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+token_refresher = TokenRefresher()
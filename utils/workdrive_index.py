@@ -0,0 +1,518 @@
+# utils/workdrive_index.py
+
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from config import Config
+from utils.zoho_crawler import FolderCrawler, get_related_link
+from utils.zoho_folder_helpers import fetch_root_folders
+from utils.single_flight import SingleFlight
+from utils.helpers import encode_cursor, decode_cursor
+from constants import response_messages as msg
+
+SCHEMA = """
+PRAGMA journal_mode = WAL;
+
+CREATE TABLE IF NOT EXISTS folders (
+    id TEXT PRIMARY KEY,
+    parent_id TEXT,
+    source TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT,
+    permalink TEXT,
+    modified_time TEXT,
+    listed_modified_time TEXT
+);
+CREATE INDEX IF NOT EXISTS folders_by_parent ON folders (parent_id, position);
+
+CREATE TABLE IF NOT EXISTS files (
+    folder_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT,
+    type TEXT,
+    permalink TEXT,
+    download_url TEXT,
+    modified_time TEXT,
+    PRIMARY KEY (folder_id, id)
+);
+CREATE INDEX IF NOT EXISTS files_by_folder ON files (folder_id, position);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS crawl_frontier (
+    sync_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    entry TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (sync_id, position)
+);
+"""
+
+SUBTREE_CTE = """
+WITH RECURSIVE subtree(id) AS (
+    SELECT id FROM folders WHERE {where}
+    UNION ALL
+    SELECT folders.id FROM folders JOIN subtree ON folders.parent_id = subtree.id
+)
+"""
+
+
+def get_modified_time(item: dict):
+    attributes = item.get("attributes", {})
+    value = attributes.get("modified_time_in_millisecond") or attributes.get("modified_time")
+    return str(value) if value is not None else None
+
+
+def compact_folder(folder: dict) -> dict:
+    """
+    The parts of a WorkDrive folder object a crawl needs, small enough to park in the frontier.
+    """
+    attributes = folder.get("attributes", {})
+    return {
+        "id": folder.get("id"),
+        "attributes": {
+            key: attributes[key]
+            for key in ("name", "permalink", "modified_time_in_millisecond", "modified_time")
+            if key in attributes
+        },
+        "relationships": {
+            relation: {"links": {"related": get_related_link(folder, relation)}}
+            for relation in ("files", "folders")
+            if get_related_link(folder, relation)
+        },
+    }
+
+
+class WorkDriveIndex:
+    """
+    Per-user SQLite index of WorkDrive folder and file metadata.
+    Listing endpoints read from here; WorkDriveSync keeps it up to date.
+    """
+
+    def __init__(self, user_id: str, path: str = None):
+        self.user_id = user_id
+        safe_id = re.sub(r"[^A-Za-z0-9_.-]", "_", user_id)
+        self.path = path or os.path.join(Config.WORKDRIVE_INDEX_DIR, f"{safe_id}.sqlite3")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self.connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def open(self) -> sqlite3.Connection:
+        # check_same_thread=False: streaming responses iterate from threadpool workers
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    @contextmanager
+    def connect(self):
+        conn = self.open()
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ---------- Sync state ----------
+
+    def last_synced_at(self):
+        with self.connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'last_synced_at'").fetchone()
+        return float(row[0]) if row else None
+
+    def has_synced(self) -> bool:
+        return self.last_synced_at() is not None
+
+    def is_stale(self, max_age: float = None) -> bool:
+        max_age = Config.WORKDRIVE_INDEX_MAX_AGE if max_age is None else max_age
+        last_synced = self.last_synced_at()
+        return last_synced is None or time.time() - last_synced > max_age
+
+    def listed_times(self) -> dict:
+        with self.connect() as conn:
+            return dict(conn.execute("SELECT id, listed_modified_time FROM folders"))
+
+    def unlisted_ancestors(self) -> set:
+        """
+        Folders with a never-listed folder somewhere below them (e.g. one a budget-limited
+        sync discovered but did not reach), so an unchanged parent does not hide it.
+        """
+        with self.connect() as conn:
+            return {row[0] for row in conn.execute(
+                """
+                WITH RECURSIVE ancestors(id) AS (
+                    SELECT parent_id FROM folders WHERE listed_modified_time IS NULL AND parent_id IS NOT NULL
+                    UNION
+                    SELECT folders.parent_id FROM folders JOIN ancestors ON folders.id = ancestors.id
+                    WHERE folders.parent_id IS NOT NULL
+                )
+                SELECT id FROM ancestors
+                """
+            )}
+
+    # ---------- Writes (used by WorkDriveSync on one connection) ----------
+
+    def upsert_folder(self, conn, folder: dict, parent_id, source: str, position: int):
+        attributes = folder.get("attributes", {})
+        conn.execute(
+            """
+            INSERT INTO folders (id, parent_id, source, position, name, permalink, modified_time)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET
+                parent_id = excluded.parent_id,
+                source = excluded.source,
+                position = excluded.position,
+                name = excluded.name,
+                permalink = excluded.permalink,
+                modified_time = excluded.modified_time
+            """,
+            (
+                folder.get("id"), parent_id, source, position,
+                attributes.get("name", "Unnamed Folder"),
+                attributes.get("permalink", ""),
+                get_modified_time(folder),
+            )
+        )
+
+    def replace_files(self, conn, folder_id: str, files: list):
+        conn.execute("DELETE FROM files WHERE folder_id = ?", (folder_id,))
+        conn.executemany(
+            """
+            INSERT OR REPLACE INTO files
+                (folder_id, id, position, name, type, permalink, download_url, modified_time)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (
+                    folder_id, file.get("id", "No ID"), position,
+                    file.get("attributes", {}).get("name", "Unnamed File"),
+                    file.get("type", "unknown"),
+                    file.get("attributes", {}).get("permalink", ""),
+                    file.get("attributes", {}).get("download_url", ""),
+                    get_modified_time(file),
+                )
+                for position, file in enumerate(files)
+            ]
+        )
+
+    def _delete_subtrees(self, conn, where: str, params: tuple):
+        cte = SUBTREE_CTE.format(where=where)
+        conn.execute(cte + "DELETE FROM files WHERE folder_id IN (SELECT id FROM subtree)", params)
+        conn.execute(cte + "DELETE FROM folders WHERE id IN (SELECT id FROM subtree)", params)
+
+    def prune_children(self, conn, parent_id: str, keep_ids: list):
+        placeholders = ",".join("?" * len(keep_ids)) or "NULL"
+        self._delete_subtrees(
+            conn, f"parent_id = ? AND id NOT IN ({placeholders})", (parent_id, *keep_ids)
+        )
+
+    def prune_roots(self, conn, source: str, keep_ids: list):
+        placeholders = ",".join("?" * len(keep_ids)) or "NULL"
+        self._delete_subtrees(
+            conn, f"parent_id IS NULL AND source = ? AND id NOT IN ({placeholders})", (source, *keep_ids)
+        )
+
+    def mark_listed(self, conn, folder_id: str, modified_time):
+        # "" rather than NULL when Zoho sends no modified time: NULL means "never listed"
+        conn.execute("UPDATE folders SET listed_modified_time = ? WHERE id = ?", (modified_time or "", folder_id))
+
+    def mark_synced(self, conn):
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('last_synced_at', ?)", (str(time.time()),)
+        )
+
+    def save_frontier(self, conn, frontier: list) -> str:
+        """
+        Parks the unvisited folders of a budget-limited sync. Returns the id to resume it with.
+        """
+        sync_id = uuid.uuid4().hex
+        now = time.time()
+        conn.execute("DELETE FROM crawl_frontier WHERE created_at < ?", (now - Config.WORKDRIVE_CURSOR_TTL,))
+        conn.executemany(
+            "INSERT INTO crawl_frontier (sync_id, position, entry, created_at) VALUES (?, ?, ?, ?)",
+            [
+                (sync_id, position, json.dumps([compact_folder(folder), depth, list(path), parent_name, context]), now)
+                for position, (folder, depth, path, parent_name, context) in enumerate(frontier)
+            ]
+        )
+        return sync_id
+
+    def take_frontier(self, sync_id: str):
+        """
+        Removes and returns a parked frontier, or None if it is unknown, expired or already resumed.
+        """
+        with self.connect() as conn:
+            rows = conn.execute(
+                "SELECT entry FROM crawl_frontier WHERE sync_id = ? AND created_at >= ? ORDER BY position",
+                (sync_id, time.time() - Config.WORKDRIVE_CURSOR_TTL)
+            ).fetchall()
+            conn.execute("DELETE FROM crawl_frontier WHERE sync_id = ?", (sync_id,))
+        if not rows:
+            return None
+        return [tuple(json.loads(row[0])) for row in rows]
+
+    # ---------- Reads ----------
+
+    def folder_trees(self, source: str = None, max_depth: int = None, pdf_only: bool = False) -> list:
+        """
+        Nested folder trees (name, id, url, files, subfolders) read from the index.
+        """
+        with self.connect() as conn:
+            folders = conn.execute(
+                "SELECT id, parent_id, source, name, permalink, listed_modified_time FROM folders ORDER BY position"
+            ).fetchall()
+            file_query = "SELECT folder_id, name, type, permalink, download_url FROM files"
+            if pdf_only:
+                file_query += " WHERE type = 'files' AND name GLOB '*.pdf'"
+            files = conn.execute(file_query + " ORDER BY position").fetchall()
+
+        children, files_by_folder = {}, {}
+        for row in folders:
+            children.setdefault(row[1], []).append(row)
+        for folder_id, name, file_type, permalink, download_url in files:
+            files_by_folder.setdefault(folder_id, []).append({
+                "name": name,
+                "download_url": download_url,
+                "url": permalink,
+                "type": file_type
+            })
+
+        def build(row, depth):
+            if max_depth is not None and depth > max_depth:
+                return {"name": "Max depth reached", "files": [], "subfolders": []}
+            folder_id, _parent_id, _source, name, permalink, listed_modified_time = row
+            node = {
+                "name": name,
+                "id": folder_id,
+                "url": permalink,
+                "files": files_by_folder.get(folder_id, []),
+                "subfolders": [build(child, depth + 1) for child in children.get(folder_id, [])]
+            }
+            if listed_modified_time is None:
+                # Discovered but never listed yet (e.g. a budget-limited sync stopped before it)
+                node["pending"] = True
+            return node
+
+        roots = [row for row in children.get(None, []) if source is None or row[2] == source]
+        return [build(row, 0) for row in roots]
+
+    def iter_flat_files(self):
+        """
+        Generator of flat file records (same shape as the n8n listing), read lazily from the index.
+        """
+        conn = self.open()
+        try:
+            cursor = conn.execute(
+                """
+                SELECT files.name, files.id, files.permalink,
+                       folders.name, folders.parent_id, parents.name, folders.source
+                FROM files
+                JOIN folders ON files.folder_id = folders.id
+                LEFT JOIN folders AS parents ON folders.parent_id = parents.id
+                ORDER BY folders.source, files.folder_id, files.position
+                """
+            )
+            for name, file_id, permalink, folder_name, parent_id, parent_name, source in cursor:
+                is_root = parent_id is None
+                yield {
+                    "name": name,
+                    "id": file_id,
+                    "url": permalink,
+                    "folder_name": folder_name if is_root else parent_name,
+                    "subfolder_name": "" if is_root else folder_name,
+                    "source": source
+                }
+        finally:
+            conn.close()
+
+
+_indexes = {}
+
+
+def get_workdrive_index(user_id: str) -> WorkDriveIndex:
+    if user_id not in _indexes:
+        _indexes[user_id] = WorkDriveIndex(user_id)
+    return _indexes[user_id]
+
+
+class WorkDriveSync:
+    """
+    Delta sync of one user's WorkDrive into their index.
+
+    Roots are always re-listed. Below them, a folder is only listed again when its
+    modified time differs from the one recorded at its last listing, or when a folder
+    below it has never been listed; unchanged folders keep their indexed files and
+    subtree. `full=True` re-lists everything.
+
+    With a CrawlBudget the sync may stop early: the unvisited folders are parked in the
+    index and `next_sync_id` is set; `resume_sync_id` continues such a sync (roots are
+    not re-listed then). The index is only marked synced once a sync runs to completion.
+    """
+
+    def __init__(
+        self, index: WorkDriveIndex, headers: dict, full: bool = False, crawler=None,
+        budget=None, resume_sync_id: str = None
+    ):
+        self.index = index
+        self.full = full
+        self.crawler = crawler or FolderCrawler(headers, user_id=index.user_id, budget=budget)
+        self.resume_sync_id = resume_sync_id
+        self.next_sync_id = None
+        self.listed = 0
+        self.skipped = 0
+        self.errors = []
+        self._feeds = []
+
+    def summary(self) -> dict:
+        return {
+            "listed": self.listed,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "complete": self.next_sync_id is None,
+            "next_sync_id": self.next_sync_id,
+        }
+
+    def subscribe(self) -> asyncio.Queue:
+        """
+        Queue that receives every re-listed visit while run() executes, then None at the end.
+        """
+        feed = asyncio.Queue()
+        self._feeds.append(feed)
+        return feed
+
+    async def visits(self):
+        """
+        Async generator: updates the index and yields every folder visit that was re-listed.
+        """
+        if self.resume_sync_id is not None:
+            resume = await asyncio.to_thread(self.index.take_frontier, self.resume_sync_id)
+            if resume is None:
+                raise ValueError(msg.INVALID_CURSOR)
+            roots_by_source = {}
+        else:
+            resume = None
+            roots_by_source, errors = await fetch_root_folders(self.crawler)
+            self.errors.extend(errors)
+        listed_times = await asyncio.to_thread(self.index.listed_times)
+        unlisted_ancestors = await asyncio.to_thread(self.index.unlisted_ancestors)
+
+        def should_list(folder):
+            modified_time = get_modified_time(folder)
+            if self.full or modified_time is None or folder.get("id") in unlisted_ancestors:
+                return True
+            return listed_times.get(folder.get("id")) != modified_time
+
+        # SQLite work runs in worker threads (one at a time) so the event loop keeps crawling
+        conn = await asyncio.to_thread(self.index.open)
+        try:
+            roots, contexts = [], []
+            for source, folders in roots_by_source.items():
+                if folders is None:
+                    continue
+                roots.extend(folders)
+                contexts.extend({"source": source} for _ in folders)
+            await asyncio.to_thread(self._save_roots, conn, roots_by_source)
+
+            async for visit in self.crawler.walk(roots, contexts, should_list=should_list, resume=resume):
+                if not visit["listed"]:
+                    self.skipped += 1
+                    continue
+
+                await asyncio.to_thread(self._save_visit, conn, visit)
+                self.listed += 1
+                yield visit
+
+            await asyncio.to_thread(self._finish, conn, resume is not None or any(
+                folders is not None for folders in roots_by_source.values()
+            ))
+        finally:
+            await asyncio.to_thread(conn.close)
+
+    def _save_roots(self, conn, roots_by_source: dict):
+        for source, folders in roots_by_source.items():
+            if folders is None:
+                continue
+            for position, folder in enumerate(folders):
+                self.index.upsert_folder(conn, folder, None, source, position)
+            self.index.prune_roots(conn, source, [folder.get("id") for folder in folders])
+
+    def _save_visit(self, conn, visit: dict):
+        folder_id = visit["folder"].get("id")
+        source = visit["context"]["source"]
+        if visit["files_error"] is None:
+            self.index.replace_files(conn, folder_id, visit["files"])
+        if visit["subfolders_error"] is None:
+            for position, subfolder in enumerate(visit["subfolders"]):
+                self.index.upsert_folder(conn, subfolder, folder_id, source, position)
+            self.index.prune_children(conn, folder_id, [sub.get("id") for sub in visit["subfolders"]])
+
+        if visit["files_error"] is None and visit["subfolders_error"] is None:
+            self.index.mark_listed(conn, folder_id, get_modified_time(visit["folder"]))
+        else:
+            self.errors.append(f"{visit['name']}: {visit['files_error'] or visit['subfolders_error']}")
+
+    def _finish(self, conn, reached_drive: bool):
+        if self.crawler.frontier:
+            self.next_sync_id = self.index.save_frontier(conn, self.crawler.frontier)
+        elif reached_drive:
+            self.index.mark_synced(conn)
+        conn.commit()
+
+    async def run(self) -> dict:
+        try:
+            # One sync per user at a time, whatever its options: they all write the same SQLite file
+            async with sync_locks.setdefault(self.index.user_id, asyncio.Lock()):
+                async for visit in self.visits():
+                    for feed in self._feeds:
+                        feed.put_nowait(visit)
+        finally:
+            for feed in self._feeds:
+                feed.put_nowait(None)
+        print(f"🗂️ WorkDrive index synced for {self.index.user_id}: {self.summary()}")
+        return self.summary()
+
+
+# Concurrent identical syncs of the same user's drive share one crawl
+index_syncs = SingleFlight()
+sync_locks = {}
+
+
+def sync_key(user_id: str, full: bool = False, budget=None, resume_sync_id: str = None):
+    """
+    Only syncs with the same options coalesce; a different one queues behind the running sync.
+    """
+    limits = None if budget is None else (budget.max_seconds, budget.max_api_calls, budget.max_nodes)
+    return (user_id, "workdrive-sync", full, limits, resume_sync_id)
+
+
+async def sync_index(
+    index: WorkDriveIndex, headers: dict, full: bool = False, budget=None, cursor: str = None
+) -> dict:
+    """
+    Syncs the index, or waits for an identical sync already in flight for this user.
+
+    `cursor` continues a budget-limited sync; the returned summary carries a new
+    `cursor` whenever the budget ran out again. Raises ValueError for a bad cursor.
+    """
+    resume_sync_id = None
+    if cursor is not None:
+        payload = decode_cursor(cursor)
+        if not payload or payload.get("user_id") != index.user_id or not payload.get("sync_id"):
+            raise ValueError(msg.INVALID_CURSOR)
+        resume_sync_id = payload["sync_id"]
+
+    summary = await index_syncs.do(
+        sync_key(index.user_id, full, budget, resume_sync_id),
+        lambda: WorkDriveSync(index, headers, full=full, budget=budget, resume_sync_id=resume_sync_id).run()
+    )
+    if summary["complete"]:
+        return {**summary, "cursor": None}
+    return {**summary, "cursor": encode_cursor({"user_id": index.user_id, "sync_id": summary["next_sync_id"]})}
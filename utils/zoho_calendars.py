@@ -0,0 +1,64 @@
+# utils/zoho_calendars.py
+
+from config import Config
+from constants import status_codes as sc
+from utils.lru_cache import LRUCache
+from utils.shared import get_user_tokens, save_user_calendars, clear_user_calendars, user_cache
+from utils.zoho_client import zoho_client
+
+# user_id -> {"calendar_id": ..., "calendars": [...]}, backed by the user record in Mongo
+calendar_cache = LRUCache(maxsize=Config.CALENDAR_CACHE_SIZE, ttl=Config.CALENDAR_CACHE_TTL)
+user_cache.add_listener(calendar_cache.pop)
+
+
+async def fetch_calendars(access_token: str, user_id: str = None) -> list:
+    """
+    Calendar metadata from Zoho Calendar (one round trip).
+    """
+    url = f"{Config.ZOHO_CALENDAR_URL}/api/v1/calendars"
+    response = await zoho_client.aget(url, access_token=access_token, user_id=user_id)
+
+    if response.status_code != sc.HTTP_OK:
+        raise Exception(f"Failed to fetch calendars: {response.text}")
+
+    return [
+        {
+            "uid": calendar.get("uid"),
+            "name": calendar.get("name"),
+            "color": calendar.get("color"),
+            "timezone": calendar.get("timezone"),
+            "isdefault": calendar.get("isdefault", False),
+        }
+        for calendar in response.json().get("calendars", [])
+    ]
+
+
+async def get_calendar_id(user_id: str, access_token: str) -> str:
+    """
+    The user's booking calendar: in-process LRU, then the user record, then Zoho.
+    """
+    entry = calendar_cache.get(user_id)
+    if entry is None:
+        record = await get_user_tokens(user_id) or {}
+        if record.get("calendar_id"):
+            entry = {"calendar_id": record["calendar_id"], "calendars": record.get("calendars", [])}
+
+    if entry is None:
+        calendars = await fetch_calendars(access_token, user_id)
+        if not calendars:
+            raise Exception("No calendars found")
+        entry = {"calendar_id": calendars[0]["uid"], "calendars": calendars}
+        await save_user_calendars(user_id, entry["calendar_id"], calendars)
+        print(f"📅 Cached {len(calendars)} calendar(s) for {user_id}")
+
+    calendar_cache.set(user_id, entry)
+    return entry["calendar_id"]
+
+
+async def invalidate_calendars(user_id: str, stored: bool = True):
+    """
+    Forgets the cached calendars (after a 404 or an auth change); `stored` also clears the user record.
+    """
+    calendar_cache.pop(user_id)
+    if stored:
+        await clear_user_calendars(user_id)
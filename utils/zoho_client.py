@@ -1,65 +1,64 @@
-import requests
-from fastapi import APIRouter, Request, HTTPException
-from pydantic import BaseModel
-from jose import jwt
-from starlette.config import Config
+import httpx
+from config import Config
+from utils.zoho_rate_limiter import zoho_rate_limiter
 
-# Config setup (can also be read from .env)
-config = Config(".env")
 
-ZOHO_ACCOUNTS_URL = config("ZOHO_ACCOUNTS_URL")
-CLIENT_ID = config("CLIENT_ID")
-CLIENT_SECRET = config("CLIENT_SECRET")
-REDIRECT_URI = config("REDIRECT_URI")
+class ZohoClient:
+    """
+    Shared HTTP client for every Zoho API call.
 
-router = APIRouter()
+    Owns one pooled keep-alive `httpx.AsyncClient` (route handlers, tools and the folder
+    crawler) with default timeouts and connection-level retries. Every request goes through
+    the rate limiter, and `access_token=` injects the user's `Zoho-oauthtoken` header.
+    """
 
-# import requests
-# from flask import current_app
-# from jose import jwt
+    def __init__(self):
+        self._async_client = None
 
-# def exchange_code_for_tokens(code):
-#     token_url = f"{current_app.config['ZOHO_ACCOUNTS_URL']}/oauth/v2/token"
-#     data = {
-#         'client_id': current_app.config['CLIENT_ID'],
-#         'client_secret': current_app.config['CLIENT_SECRET'],
-#         'grant_type': 'authorization_code',
-#         'code': code,
-#         'redirect_uri': current_app.config['REDIRECT_URI'],
-#     }
-#     headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-#     res = requests.post(token_url, data=data, headers=headers)
-#     return res
+    @staticmethod
+    def auth_headers(access_token: str = None, headers: dict = None) -> dict:
+        merged = dict(headers or {})
+        if access_token:
+            merged["Authorization"] = f"Zoho-oauthtoken {access_token}"
+        return merged
 
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(
+                http2=Config.ZOHO_HTTP2,
+                timeout=Config.ZOHO_HTTP_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=Config.ZOHO_POOL_SIZE,
+                    max_keepalive_connections=Config.ZOHO_POOL_SIZE,
+                ),
+                transport=httpx.AsyncHTTPTransport(
+                    http2=Config.ZOHO_HTTP2, retries=Config.ZOHO_HTTP_RETRIES
+                ),
+            )
+        return self._async_client
 
+    # ---------- Async ----------
 
-def exchange_code_for_tokens(code: str):
-    token_url = f"{ZOHO_ACCOUNTS_URL}/oauth/v2/token"
-    data = {
-        'client_id': CLIENT_ID,
-        'client_secret': CLIENT_SECRET,
-        'grant_type': 'authorization_code',
-        'code': code,
-        'redirect_uri': REDIRECT_URI,
-    }
-    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-    res = requests.post(token_url, data=data, headers=headers)
-    return res
+    async def arequest(self, method: str, url, access_token: str = None, user_id: str = None, org_id: str = None, **kwargs):
+        kwargs["headers"] = self.auth_headers(access_token, kwargs.get("headers"))
+        return await zoho_rate_limiter.request(
+            self.async_client, method, url, user_id=user_id, org_id=org_id, **kwargs
+        )
 
+    async def aget(self, url, **kwargs):
+        return await self.arequest("GET", url, **kwargs)
 
-@router.get("/oauth/callback")
-async def oauth_callback(code: str):
-    response = exchange_code_for_tokens(code)
-    if response.ok:
-        tokens = response.json()
-        access_token = tokens.get("access_token")
-        refresh_token = tokens.get("refresh_token")
-        # You can optionally decode or store tokens here
-        return {
-            "access_token": access_token,
-            "refresh_token": refresh_token,
-            "message": "Token exchange successful"
-        }
-    else:
-        raise HTTPException(status_code=response.status_code, detail="Failed to exchange code for tokens")
+    async def apost(self, url, **kwargs):
+        return await self.arequest("POST", url, **kwargs)
+
+    # ---------- Lifecycle ----------
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+
+zoho_client = ZohoClient()
 
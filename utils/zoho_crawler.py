@@ -0,0 +1,256 @@
+# utils/zoho_crawler.py
+
+import asyncio
+import time
+import httpx
+from config import Config
+from constants import status_codes as sc
+from utils.zoho_client import zoho_client
+
+def get_related_link(folder: dict, relation: str):
+    return (
+        folder
+        .get("relationships", {})
+        .get(relation, {})
+        .get("links", {})
+        .get("related")
+    )
+
+
+class CrawlBudgetExhausted(Exception):
+    pass
+
+
+class CrawlBudget:
+    """
+    Limits for one crawl: wall-clock seconds, Zoho API calls and folders visited.
+    A limit left as None is unlimited.
+
+    `max_nodes` and `max_api_calls` only decide whether another folder visit may start;
+    a visit that has started always finishes its listing calls. `max_seconds` is a hard
+    deadline that also stops visits in flight.
+    """
+
+    # A listed folder costs at least two calls (files + subfolders)
+    CALLS_PER_VISIT = 2
+
+    def __init__(self, max_seconds: float = None, max_api_calls: int = None, max_nodes: int = None):
+        self.max_seconds = max_seconds
+        self.max_api_calls = max_api_calls
+        self.max_nodes = max_nodes
+        self.deadline = time.monotonic() + max_seconds if max_seconds else None
+        self.api_calls = 0
+        self.nodes = 0
+
+    def remaining_seconds(self):
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def out_of_time(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def can_start_visit(self, in_flight: int = 0) -> bool:
+        """
+        Whether one more folder visit fits, counting the calls `in_flight` visits are about to make.
+        """
+        return not (
+            self.out_of_time()
+            or (self.max_nodes is not None and self.nodes >= self.max_nodes)
+            or (self.max_api_calls is not None
+                and self.api_calls + in_flight * self.CALLS_PER_VISIT >= self.max_api_calls)
+        )
+
+
+class FolderCrawler:
+    """
+    Breadth-first WorkDrive folder crawler.
+
+    The files and subfolders listings of a folder are fetched together, and every
+    subfolder is scheduled as soon as its parent has been listed, so wall time grows
+    with tree depth instead of folder count. A semaphore caps this crawl's in-flight requests; all of them share the pooled
+    ZohoClient (and its rate limiter).
+
+    With a CrawlBudget, no new folder visit starts once the budget is spent (and visits
+    in flight are stopped at its deadline); folders that were not visited are left in
+    `frontier` so the crawl can be resumed later.
+    """
+
+    def __init__(
+        self, headers: dict, max_depth: int = None, concurrency: int = None, client=None,
+        user_id: str = None, org_id: str = None, budget: CrawlBudget = None
+    ):
+        self.headers = headers
+        self.max_depth = max_depth
+        self.user_id = user_id
+        self.org_id = org_id
+        self.client = client or zoho_client
+        self.budget = budget
+        self.frontier = []
+        self._semaphore = asyncio.Semaphore(concurrency or Config.ZOHO_CRAWL_CONCURRENCY)
+
+    async def fetch_json(self, url: str, params: dict = None, enforce_budget: bool = False):
+        """
+        GET a Zoho URL. Returns (json, None) on success or (None, error_text).
+        Every call is charged to the budget; with `enforce_budget` a call after the
+        budget's deadline raises CrawlBudgetExhausted instead of being sent.
+        """
+        if params:
+            # Merge rather than replace: related links may already carry a query string
+            url = httpx.URL(url).copy_merge_params(params)
+
+        try:
+            async with self._semaphore:
+                if self.budget is not None:
+                    if enforce_budget and self.budget.out_of_time():
+                        raise CrawlBudgetExhausted()
+                    self.budget.api_calls += 1
+                res = await self.client.aget(url, headers=self.headers, user_id=self.user_id, org_id=self.org_id)
+        except httpx.HTTPError as e:
+            return None, f"Request error: {str(e)}"
+
+        if res.status_code != sc.HTTP_OK:
+            return None, res.text
+        return res.json(), None
+
+    async def fetch_pages(self, url: str, enforce_budget: bool = False):
+        """
+        Async generator over every page of a WorkDrive listing as (items, error).
+        Follows `links.next`, cursor pagination (`page[next]`) and plain offsets.
+        """
+        limit = Config.ZOHO_PAGE_LIMIT
+        params = {"page[limit]": limit, "page[offset]": 0}
+
+        while True:
+            data, error = await self.fetch_json(url, params, enforce_budget)
+            if error is not None:
+                yield [], error
+                return
+
+            items = data.get("data", [])
+            yield items, None
+
+            links = data.get("links") or {}
+            cursor = links.get("cursor") or {}
+            if not items:
+                return
+            if links.get("next"):
+                url, params = links["next"], None
+            elif cursor:
+                if not (cursor.get("has_next") and cursor.get("next")):
+                    return
+                params = {"page[limit]": limit, "page[next]": cursor["next"]}
+            elif params is not None and "page[offset]" in params and len(items) == limit:
+                params = {"page[limit]": limit, "page[offset]": params["page[offset]"] + limit}
+            else:
+                return
+
+    async def _list(self, folder: dict, relation: str) -> dict:
+        link = get_related_link(folder, relation)
+        if not link:
+            return {"available": False, "data": [], "error": None}
+
+        items = []
+        async for page, error in self.fetch_pages(link, enforce_budget=True):
+            if error is not None:
+                return {"available": True, "data": items, "error": error}
+            items.extend(page)
+        return {"available": True, "data": items, "error": None}
+
+    async def _visit(self, folder: dict, depth: int, path: tuple, parent_name, context, should_list=None) -> dict:
+        listed = should_list is None or should_list(folder)
+        if listed:
+            files, subfolders = await asyncio.gather(
+                self._list(folder, "files"),
+                self._list(folder, "folders"),
+            )
+        else:
+            files = subfolders = {"available": False, "data": [], "error": None}
+
+        return {
+            "folder": folder,
+            "listed": listed,
+            "name": folder.get("attributes", {}).get("name", "Unnamed Folder"),
+            "depth": depth,
+            "path": path,
+            "parent_name": parent_name,
+            "context": context,
+            "files": files["data"],
+            "files_available": files["available"],
+            "files_error": files["error"],
+            "subfolders": subfolders["data"],
+            "subfolders_available": subfolders["available"],
+            "subfolders_error": subfolders["error"],
+        }
+
+    async def walk(self, roots: list, contexts: list = None, should_list=None, resume: list = None):
+        """
+        Async generator yielding one visit dict per crawled folder.
+
+        `path` is the tuple of child indexes from the root list, so callers can
+        rebuild ordered trees regardless of the order visits complete in.
+        `contexts` (one per root) is passed through to every visit below that root.
+        `should_list(folder)` returning False skips listing that folder and its subtree.
+        `resume` is a previous crawler's `frontier`; those folders are crawled instead of `roots`.
+
+        Every folder the budget does not let start is appended to `self.frontier` as
+        (folder, depth, path, parent_name, context); at the budget's deadline in-flight
+        visits are cancelled and parked there too.
+        """
+        pending = {}
+        contexts = contexts or [None] * len(roots)
+
+        def schedule(folder, depth, path, parent_name, context):
+            entry = (folder, depth, tuple(path), parent_name, context)
+            if self.budget is not None and not self.budget.can_start_visit(len(pending)):
+                self.frontier.append(entry)
+                return
+            if self.budget is not None:
+                self.budget.nodes += 1
+            task = asyncio.ensure_future(self._visit(*entry, should_list))
+            pending[task] = entry
+
+        if resume is not None:
+            for entry in resume:
+                schedule(*entry)
+        else:
+            for index, folder in enumerate(roots):
+                schedule(folder, 0, (index,), None, contexts[index])
+
+        def finish(task):
+            """
+            Returns the visit of a finished task, or None after putting its folder back on the frontier.
+            """
+            entry = pending.pop(task)
+            if task.cancelled() or isinstance(task.exception(), CrawlBudgetExhausted):
+                self.frontier.append(entry)
+                return None
+            visit = task.result()
+            if self.max_depth is None or visit["depth"] < self.max_depth:
+                for index, subfolder in enumerate(visit["subfolders"]):
+                    schedule(
+                        subfolder, visit["depth"] + 1, visit["path"] + (index,),
+                        visit["name"], visit["context"]
+                    )
+            return visit
+
+        try:
+            while pending:
+                timeout = self.budget.remaining_seconds() if self.budget is not None else None
+                done, _ = await asyncio.wait(
+                    list(pending), timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if self.budget is not None and self.budget.out_of_time():
+                    # Past the deadline: stop whatever is still running and keep it for the next crawl
+                    for task in pending:
+                        task.cancel()
+                    await asyncio.gather(*pending, return_exceptions=True)
+                    done = list(pending)
+
+                for task in done:
+                    visit = finish(task)
+                    if visit is not None:
+                        yield visit
+        finally:
+            for task in pending:
+                task.cancel()
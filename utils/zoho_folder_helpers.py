@@ -1,132 +1,210 @@
-import requests
-from constants import status_codes as sc
+import asyncio
+from config import Config
+from constants import response_messages as msg
+from utils.zoho_crawler import FolderCrawler
 
-def get_folder_contents_json(folder, headers):
+
+async def build_folder_tree(folder, headers, build_node, max_depth=None, depth_placeholder=None, crawler=None):
+    """
+    Crawls `folder` breadth-first and assembles a nested tree.
+    `build_node(visit)` turns one crawler visit into the node dict (with a `subfolders` list).
+    Folders left unvisited because the crawler's budget ran out stay as `pending` nodes.
+    """
+    crawler = crawler or FolderCrawler(headers, max_depth=max_depth)
+    max_depth = crawler.max_depth
+
+    tree = pending_node(folder)
+    slots = {(0,): tree}
+
+    async for visit in crawler.walk([folder]):
+        node = slots.pop(visit["path"])
+        node.clear()
+        node.update(build_node(visit))
+
+        for index, subfolder in enumerate(visit["subfolders"]):
+            if max_depth is not None and visit["depth"] >= max_depth:
+                node["subfolders"].append(dict(depth_placeholder or {}))
+                continue
+            child = pending_node(subfolder)
+            node["subfolders"].append(child)
+            slots[visit["path"] + (index,)] = child
+
+    return tree
+
+
+def pending_node(folder):
+    attributes = folder.get("attributes", {})
+    return {
+        "name": attributes.get("name", "Unnamed Folder"),
+        "id": folder.get("id", "No ID"),
+        "url": attributes.get("permalink", ""),
+        "pending": True,
+        "files": [],
+        "subfolders": []
+    }
+
+
+def _folder_contents_node(visit):
+    folder = visit["folder"]
     attributes = folder.get("attributes", {})
-    folder_name = attributes.get("name", "Unnamed Folder")
-    folder_id = folder.get("id", "No ID")
-    folder_url = attributes.get("permalink", "")
 
     folder_data = {
-        "name": folder_name,
-        "id": folder_id,
-        "url": folder_url,
+        "name": attributes.get("name", "Unnamed Folder"),
+        "id": folder.get("id", "No ID"),
+        "url": attributes.get("permalink", ""),
         "files": [],
         "subfolders": []
     }
 
-    # Check files link
-    files_link = (
-        folder
-        .get("relationships", {})
-        .get("files", {})
-        .get("links", {})
-        .get("related")
-    )
-
-    if files_link:
-        files_res = requests.get(files_link, headers=headers)
-        if files_res.status_code == sc.HTTP_OK:
-            files_data = files_res.json()
-            files_list = files_data.get("data", [])
-            for file in files_list:
-                file_attributes = file.get("attributes", {})
-                file_name = file_attributes.get("name", "Unnamed File")
-                file_type = file.get("type", "unknown")
-                file_url = file_attributes.get("permalink", "")
-
-                folder_data["files"].append({
-                    "name": file_name,
-                    "type": file_type,
-                    "url": file_url
-                })
-        else:
-            folder_data["files"].append({
-                "error": f"Failed to fetch files: {files_res.text}"
-            })
-    else:
+    # Files listing
+    if not visit["files_available"]:
         folder_data["files"].append({
             "message": "Files listing not available for this folder."
         })
-
-    # Check subfolders link
-    subfolders_link = (
-        folder
-        .get("relationships", {})
-        .get("folders", {})
-        .get("links", {})
-        .get("related")
-    )
-
-    if subfolders_link:
-        subfolders_res = requests.get(subfolders_link, headers=headers)
-        if subfolders_res.status_code == sc.HTTP_OK:
-            subfolders_data = subfolders_res.json()
-            subfolders_list = subfolders_data.get("data", [])
-            for subfolder in subfolders_list:
-                subfolder_data = get_folder_contents_json(subfolder, headers)
-                folder_data["subfolders"].append(subfolder_data)
-        else:
-            folder_data["subfolders"].append({
-                "error": f"Failed to fetch subfolders: {subfolders_res.text}"
-            })
+    elif visit["files_error"] is not None:
+        folder_data["files"].append({
+            "error": f"Failed to fetch files: {visit['files_error']}"
+        })
     else:
+        for file in visit["files"]:
+            file_attributes = file.get("attributes", {})
+            folder_data["files"].append({
+                "name": file_attributes.get("name", "Unnamed File"),
+                "type": file.get("type", "unknown"),
+                "url": file_attributes.get("permalink", ""),
+                "download_url": file_attributes.get("download_url", "")
+            })
+
+    # Subfolders listing (children are filled in by build_folder_tree)
+    if not visit["subfolders_available"]:
         folder_data["subfolders"].append({
             "message": "Subfolders listing not available for this folder."
         })
+    elif visit["subfolders_error"] is not None:
+        folder_data["subfolders"].append({
+            "error": f"Failed to fetch subfolders: {visit['subfolders_error']}"
+        })
 
     return folder_data
 
-def collect_all_files_flat(folder, headers, parent_folder_name="", parent_subfolder_name=""):
-    files_flat = []
-
-    current_folder_name = folder.get("attributes", {}).get("name", "Unnamed Folder")
 
-    # Files directly in this folder
-    files_link = (
-        folder
-        .get("relationships", {})
-        .get("files", {})
-        .get("links", {})
-        .get("related")
+async def get_folder_contents_json(folder, headers, max_depth=None, crawler=None):
+    return await build_folder_tree(
+        folder, headers, _folder_contents_node,
+        max_depth=max_depth,
+        depth_placeholder={"message": "Max recursion depth reached"},
+        crawler=crawler
     )
-    if files_link:
-        files_res = requests.get(files_link, headers=headers)
-        if files_res.status_code == sc.HTTP_OK:
-            files_data = files_res.json()
-            files_list = files_data.get("data", [])
-            for file in files_list:
-                file_attributes = file.get("attributes", {})
-                files_flat.append({
-                    "name": file_attributes.get("name", "Unnamed File"),
-                    "id": file.get("id", "No ID"),
-                    "url": file_attributes.get("permalink", ""),
-                    "folder_name": parent_folder_name or current_folder_name,
-                    "subfolder_name": parent_subfolder_name
-                })
-
-    # Subfolders
-    subfolders_link = (
-        folder
-        .get("relationships", {})
-        .get("folders", {})
-        .get("links", {})
-        .get("related")
+
+
+def flat_file_records(visit, parent_folder_name="", parent_subfolder_name=""):
+    if visit["depth"] == 0:
+        folder_name = parent_folder_name or visit["name"]
+        subfolder_name = parent_subfolder_name
+    else:
+        folder_name = visit["parent_name"]
+        subfolder_name = visit["name"]
+
+    for file in visit["files"]:
+        file_attributes = file.get("attributes", {})
+        yield {
+            "name": file_attributes.get("name", "Unnamed File"),
+            "id": file.get("id", "No ID"),
+            "url": file_attributes.get("permalink", ""),
+            "folder_name": folder_name,
+            "subfolder_name": subfolder_name
+        }
+
+
+async def fetch_root_folders(crawler):
+    """
+    Lists the user's WorkDrive roots (incoming folders and My Folders), following pagination.
+    Returns ({source: [folders] or None}, errors) — a source is None when its listing failed.
+    """
+    async def list_all(url):
+        found = []
+        async for page, error in crawler.fetch_pages(url):
+            if error is not None:
+                return None, f"{msg.FOLDERS_FETCH_FAILED}: {error}"
+            found.extend(page)
+        return found, None
+
+    async def fetch_incoming():
+        user_url = f"{Config.ZOHO_API_URL}/workdrive/api/v1/users/me"
+        data, error = await crawler.fetch_json(user_url)
+        if error is not None:
+            return None, f"{msg.FETCH_USER_FAILED}: {error}"
+        incoming_link = (
+            data
+            .get("data", {})
+            .get("relationships", {})
+            .get("incomingfolders", {})
+            .get("links", {})
+            .get("related")
+        )
+        if not incoming_link:
+            return None, msg.NO_ROOT_FOLDER
+        return await list_all(incoming_link)
+
+    async def fetch_myfolders():
+        return await list_all(f"{Config.ZOHO_API_URL}/workdrive/api/v1/myfolders")
+
+    (incoming, incoming_error), (myfolders, myfolders_error) = await asyncio.gather(
+        fetch_incoming(), fetch_myfolders()
     )
-    if subfolders_link:
-        subfolders_res = requests.get(subfolders_link, headers=headers)
-        if subfolders_res.status_code == sc.HTTP_OK:
-            subfolders_data = subfolders_res.json()
-            subfolders_list = subfolders_data.get("data", [])
-            for subfolder in subfolders_list:
-                subfolder_name = subfolder.get("attributes", {}).get("name", "Unnamed Subfolder")
-                # Recursively collect files from subfolder
-                subfolder_files = collect_all_files_flat(
-                    subfolder, headers,
-                    parent_folder_name=current_folder_name,
-                    parent_subfolder_name=subfolder_name
-                )
-                files_flat.extend(subfolder_files)
-
-    return files_flat
+    errors = [error for error in (incoming_error, myfolders_error) if error]
+    return {"incoming": incoming, "myfolder": myfolders}, errors
+
+
+async def fetch_teams(crawler):
+    """
+    Lists the user's WorkDrive teams. Returns (teams, error).
+    """
+    teams = []
+    async for page, error in crawler.fetch_pages(f"{Config.ZOHO_API_URL}/workdrive/api/v1/users/me/teams"):
+        if error is not None:
+            return [], error
+        teams.extend(team for team in page if team.get("id"))
+    return teams, None
+
+
+async def fetch_team_folders(crawler, team, include_contents=False):
+    """
+    Team folders of one team; with `include_contents` each folder is crawled
+    through the same crawler (and so the same in-flight request cap).
+    """
+    team_id = team.get("id")
+    team_data = {
+        "team_id": team_id,
+        "team_name": team.get("attributes", {}).get("name", "Unnamed Team"),
+        "folders": [],
+        "error": None
+    }
+
+    folders = []
+    url = f"{Config.ZOHO_API_URL}/workdrive/api/v1/teamfolders?org_id={team_id}"
+    async for page, error in crawler.fetch_pages(url):
+        if error is not None:
+            team_data["error"] = error
+            break
+        folders.extend(page)
+
+    contents = [None] * len(folders)
+    if include_contents:
+        contents = await asyncio.gather(
+            *(get_folder_contents_json(folder, crawler.headers, crawler=crawler) for folder in folders)
+        )
+
+    for folder, folder_contents in zip(folders, contents):
+        folder_data = {
+            "name": folder.get("attributes", {}).get("name", "Unnamed Folder"),
+            "id": folder.get("id", "No ID")
+        }
+        if folder_contents is not None:
+            folder_data["files"] = folder_contents["files"]
+            folder_data["subfolders"] = folder_contents["subfolders"]
+            if folder_contents.get("pending"):
+                folder_data["pending"] = True
+        team_data["folders"].append(folder_data)
 
+    return team_data
@@ -0,0 +1,203 @@
+# utils/zoho_rate_limiter.py
+
+import asyncio
+import hashlib
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from config import Config
+
+THROTTLE_STATUS_CODES = (429, 503)
+
+
+class TokenBucket:
+    """
+    Token bucket that hands out reservations: a caller takes a token immediately
+    and is told how long to wait before using it, so waiters are served in order
+    without polling. `block_for` stops the bucket entirely (Retry-After).
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    def block_for(self, seconds: float):
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on in-flight Zoho requests: grows by ~1 per window of successful
+    calls and halves whenever Zoho throttles us. Callers over the limit wait on a
+    Condition that `release` notifies.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self._condition = None
+        self._loop = None
+
+    def _waiters(self) -> asyncio.Condition:
+        # Bound to the running loop, so a new loop (scripts, tests) gets a new Condition
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._condition, self._loop = asyncio.Condition(), loop
+        return self._condition
+
+    def _try_acquire(self) -> bool:
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    async def acquire(self):
+        condition = self._waiters()
+        async with condition:
+            await condition.wait_for(self._try_acquire)
+
+    async def release(self, throttled: bool):
+        condition = self._waiters()
+        async with condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit / 2)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            condition.notify(max(int(self.limit) - self.in_flight, 0))
+
+
+class ZohoRateLimiter:
+    """
+    Central scheduler for outbound Zoho calls.
+
+    - one token bucket per org and per user; calls without an org_id share the
+      deployment's org (the app serves a single Zoho org), anonymous calls only the org's
+    - a shared adaptive concurrency limit
+    - retries on 429/503 honouring Retry-After, otherwise exponential backoff with full jitter
+    - X-RateLimit-Remaining / X-RateLimit-Reset headers pause the bucket before we get throttled
+    """
+
+    def __init__(self):
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+        # Starts at half the ceiling so additive increase has room to probe upwards
+        self.concurrency = AdaptiveConcurrency(
+            max(Config.ZOHO_MAX_CONCURRENCY // 2, Config.ZOHO_MIN_CONCURRENCY),
+            Config.ZOHO_MIN_CONCURRENCY,
+            Config.ZOHO_MAX_CONCURRENCY,
+        )
+
+    def _bucket(self, key: str, rate: float, capacity: float) -> TokenBucket:
+        with self._buckets_lock:
+            if key not in self._buckets:
+                self._buckets[key] = TokenBucket(rate, capacity)
+            return self._buckets[key]
+
+    def _buckets_for(self, user_key: str, org_id) -> list:
+        buckets = [self._bucket(f"org:{org_id or 'default'}", Config.ZOHO_ORG_RATE, Config.ZOHO_ORG_BURST)]
+        if user_key is not None:
+            buckets.append(self._bucket(f"user:{user_key}", Config.ZOHO_USER_RATE, Config.ZOHO_USER_BURST))
+        return buckets
+
+    @staticmethod
+    def user_key(user_id, headers) -> str:
+        """
+        Per-user bucket key: the user_id, else a hash of the access token, else None
+        (anonymous calls such as the JWKS fetch have no user bucket).
+        """
+        if user_id:
+            return user_id
+        token = (headers or {}).get("Authorization")
+        if not token:
+            return None
+        return "token:" + hashlib.sha1(token.encode()).hexdigest()[:12]
+
+    @staticmethod
+    def retry_after(response) -> float:
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                return None
+
+    @staticmethod
+    def backoff(attempt: int) -> float:
+        ceiling = min(Config.ZOHO_BACKOFF_MAX, Config.ZOHO_BACKOFF_BASE * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def _after_response(self, response, buckets, attempt: int):
+        """
+        Updates limiter state from a response. Returns the delay before retrying, or None.
+        """
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        if remaining is not None and reset is not None:
+            try:
+                if int(remaining) <= 0:
+                    for bucket in buckets:
+                        bucket.block_for(min(float(reset), Config.ZOHO_BACKOFF_MAX))
+            except ValueError:
+                pass
+
+        if response.status_code not in THROTTLE_STATUS_CODES:
+            return None
+
+        delay = self.retry_after(response)
+        if delay is None:
+            delay = self.backoff(attempt)
+        for bucket in buckets:
+            bucket.block_for(delay)
+
+        if attempt >= Config.ZOHO_MAX_RETRIES:
+            return None
+        print(f"⏳ Zoho throttled ({response.status_code}), retrying in {delay:.2f}s")
+        return delay
+
+    async def request(self, client, method: str, url, user_id: str = None, org_id: str = None, **kwargs):
+        """
+        Sends a request through an httpx.AsyncClient under the rate limits.
+        """
+        buckets = self._buckets_for(self.user_key(user_id, kwargs.get("headers")), org_id)
+        attempt = 0
+        while True:
+            await asyncio.sleep(max(bucket.reserve() for bucket in buckets))
+            await self.concurrency.acquire()
+
+            throttled = False
+            try:
+                response = await client.request(method, url, **kwargs)
+                throttled = response.status_code in THROTTLE_STATUS_CODES
+            finally:
+                await self.concurrency.release(throttled)
+
+            delay = self._after_response(response, buckets, attempt)
+            if delay is None:
+                return response
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+zoho_rate_limiter = ZohoRateLimiter()